@@ -1,17 +1,26 @@
-import sys, time, threading, queue, re
+import sys, time, threading, queue, argparse
+_T0 = time.perf_counter()  # startup reference for --bench-startup
 from datetime import datetime
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QPushButton,
     QComboBox, QTextEdit, QVBoxLayout, QHBoxLayout, QGridLayout,
-    QFrame, QMessageBox, QSpacerItem, QSizePolicy
+    QFrame, QMessageBox
 )
 from PySide6.QtCore import Qt, QTimer, Signal, QObject
 
 from PySide6.QtGui import QFont
 
 import serial
-import serial.tools.list_ports
+
+from rs485_core import merge, Sample, SerialLink
+
+
+def list_ports():
+    # serial.tools.list_ports is slow to import and enumerate on some
+    # platforms, so it is only pulled in when a scan actually runs
+    from serial.tools import list_ports as lp
+    return [p.device for p in lp.comports()]
 
 
 # ================= SIGNAL BRIDGE =================
@@ -19,26 +28,65 @@ class SerialSignals(QObject):
     rx = Signal(str)
     log = Signal(str)
     auto = Signal(str)
+    ports = Signal(list)
+    sample = Signal(object)
+    cmd = Signal(str)
+    link_error = Signal(str, str)
+    detected = Signal(str, int, str)
+    wave = Signal(object)
 
 
 # ================= MAIN WINDOW =================
 class RS485Monitor(QMainWindow):
-    def __init__(self):
+    def __init__(self, acq_process=False, rs485=None, rx_buffer=None, low_latency=False,
+                 waveform=False):
         super().__init__()
         self.setWindowTitle("RS485 Power Monitor")
-        self.setFixedSize(900, 400)
+        self.setFixedSize(900, 560 if waveform else 400)
 
-        self.ser = None
-        self.running = False
+        self.link = None
+        self.rs485 = rs485  # (delay before TX, delay after TX) in s, or None
+        self.rx_buffer = rx_buffer
+        self.low_latency = low_latency
         self.auto_connecting = False
+        self.scanning = False
+        self.detecting = False
+        self.detect_manual = False
+        self.detect_cancel = threading.Event()
+        self.auto_probed = set()  # ports auto-connect already probed for a baud rate
         self.queue = queue.Queue()
         self.signals = SerialSignals()
+        self.sinks = ()  # extra consumers of parsed samples, fed from the reader thread
+        self.ipc = None
+        self.http = None
         self.auto_timer = QTimer()
+
+        # Out-of-process acquisition (--acq-process): the child owns the port
+        self.acq_process = acq_process
+        self.acq = None
+        self.acq_opened = False
+        self.acq_lost = 0
+        self.acq_stats = None
+        self.acq_timer = QTimer()
+        self.acq_timer.setInterval(50)
+
+        # Live line-integrity readout
+        self.stats_timer = QTimer()
+        self.stats_timer.setInterval(1000)
+
+        # Raw waveform mode (--waveform); analysis lives in rs485_wave
+        self.waveform = waveform
+        self.analyzer = None
         
         self._colors()
+        self._apply_stylesheet()
         self._ui()
+        if self.waveform:
+            self._wave_ui()
         self._connect_signals()
-        self.scan_ports()
+
+        # Enumerate ports once the window is up instead of blocking it
+        QTimer.singleShot(0, self.scan_ports)
 
     # ================= COLORS =================
     def _colors(self):
@@ -53,10 +101,113 @@ class RS485Monitor(QMainWindow):
         self.GRAY = "#334155"
         self.NEW = "#ffffff"
 
+    # ================= STYLE =================
+    def _stylesheet(self):
+        return f"""
+            QWidget#root {{ background: {self.BG}; }}
+            QFrame#side {{ background: {self.PANEL}; border-radius: 8px; }}
+            QFrame#card {{ background: {self.CARD}; border-radius: 12px; }}
+            QWidget#cardContainer, QLabel {{ background: transparent; }}
+
+            QLabel#title {{ color: {self.TEXT}; }}
+            QLabel#integrity {{ color: {self.MUTED}; padding-right: 12px; }}
+            QLabel#integrity[state="lossy"] {{ color: #fb923c; }}
+            QLabel#status[state="connected"] {{ color: {self.GREEN}; }}
+            QLabel#status[state="disconnected"] {{ color: {self.RED}; }}
+            QLabel[role="muted"] {{ color: {self.MUTED}; }}
+            QLabel[role="cardText"] {{ color: {self.MUTED}; padding: 4px; }}
+            QLabel[role="cardValue"] {{ color: {self.BLUE}; padding: 8px; }}
+
+            QTextEdit#log {{
+                background: #020617;
+                color: {self.TEXT};
+                font-family: Consolas;
+                border-radius: 8px;
+                padding: 8px;
+            }}
+
+            QComboBox {{
+                background: #ffffff;
+                color: #000000;
+                border: 1px solid #cbd5e1;
+                border-radius: 6px;
+                padding: 6px;
+            }}
+            QComboBox:hover {{
+                border-color: #60a5fa;
+            }}
+            QComboBox:focus {{
+                border-color: #3b82f6;
+            }}
+            QComboBox::drop-down {{
+                border: none;
+                width: 24px;
+            }}
+            QComboBox QAbstractItemView {{
+                color: #000000;
+                border: 1px solid #cbd5e1;
+                border-radius: 10px;
+                outline: none;
+            }}
+            QComboBox QAbstractItemView::item {{
+                background: #ffffff;
+                color: #000000;
+                padding: 1px 2px;
+                border: 2px solid #e5e7eb;
+                border-radius: 6px;
+            }}
+            QComboBox QAbstractItemView::item:selected {{
+                background: #e0f2fe;
+                color: #000000;
+            }}
+
+            QPushButton {{
+                background-color: {self.GRAY};
+                color: {self.TEXT};
+                border: none;
+                border-radius: 6px;
+                padding: 8px;
+                font-weight: bold;
+            }}
+            QPushButton:hover {{ background-color: #475569; }}
+            QPushButton:pressed {{ background-color: #1e293b; }}
+
+            QPushButton[variant="go"] {{ background-color: {self.GREEN}; color: {self.NEW}; }}
+            QPushButton[variant="go"]:hover {{ background-color: #16a34a; }}
+            QPushButton[variant="go"]:pressed {{ background-color: #15803d; }}
+
+            QPushButton[variant="alt"] {{ background-color: #fb923c; color: {self.NEW}; }}
+            QPushButton[variant="alt"]:hover {{ background-color: #ea580c; }}
+
+            QPushButton[variant="stop"] {{ background-color: {self.RED}; color: {self.NEW}; }}
+            QPushButton[variant="stop"]:hover {{ background-color: #dc2626; }}
+        """
+
+    def _apply_stylesheet(self):
+        # One sheet for the whole app; widgets only carry object names and
+        # dynamic properties, so a state change is a property flip + repolish
+        app = QApplication.instance()
+        (app or self).setStyleSheet(self._stylesheet())
+
+    def _set_prop(self, widget, name, value):
+        widget.setProperty(name, value)
+        widget.style().unpolish(widget)
+        widget.style().polish(widget)
+
+    def _set_status(self, connected):
+        self.status.setText("● Connected" if connected else "● Disconnected")
+        self._set_prop(self.status, "state", "connected" if connected else "disconnected")
+        if self.http:
+            self.http.set_state(
+                connected,
+                self.port_cb.currentText() if connected else None,
+                int(self.baud_cb.currentText()) if connected else None
+            )
+
     # ================= UI =================
     def _ui(self):
         root = QWidget()
-        root.setStyleSheet(f"background:{self.BG};")
+        root.setObjectName("root")
         self.setCentralWidget(root)
 
         main_layout = QVBoxLayout(root)
@@ -66,15 +217,21 @@ class RS485Monitor(QMainWindow):
         # HEADER
         header = QHBoxLayout()
         title = QLabel("RS485 Power Monitor")
+        title.setObjectName("title")
         title.setFont(QFont("Segoe UI", 22, QFont.Bold))
-        title.setStyleSheet(f"color:{self.TEXT}")
         header.addWidget(title)
 
         header.addStretch()
 
+        self.integrity = QLabel("")
+        self.integrity.setObjectName("integrity")
+        self.integrity.setFont(QFont("Segoe UI", 10))
+        header.addWidget(self.integrity)
+
         self.status = QLabel("● Disconnected")
+        self.status.setObjectName("status")
+        self.status.setProperty("state", "disconnected")
         self.status.setFont(QFont("Segoe UI", 12))
-        self.status.setStyleSheet(f"color:{self.RED}")
         header.addWidget(self.status)
 
         main_layout.addLayout(header)
@@ -86,8 +243,8 @@ class RS485Monitor(QMainWindow):
 
         # SIDEBAR
         side = QFrame()
+        side.setObjectName("side")
         side.setFixedWidth(260)
-        side.setStyleSheet(f"background:{self.PANEL}; border-radius:8px;")
         body.addWidget(side)
 
         side_layout = QVBoxLayout(side)
@@ -99,54 +256,14 @@ class RS485Monitor(QMainWindow):
         serial_section.setSpacing(6)
         
         serial_label = QLabel("SERIAL")
-        serial_label.setStyleSheet(f"color:{self.MUTED}")
+        serial_label.setProperty("role", "muted")
         serial_section.addWidget(serial_label)
 
         self.port_cb = QComboBox()
         self.baud_cb = QComboBox()
-        self.baud_cb.addItems(["9600","19200","38400","57600","115200"])
+        self.baud_cb.addItems(["Auto","9600","19200","38400","57600","115200"])
         self.baud_cb.setCurrentText("115200")
 
-        combo_style = """
-            QComboBox {
-                background: #ffffff;
-                color: #000000;
-                border: 1px solid #cbd5e1;
-                border-radius: 6px;
-                padding: 6px;
-            }
-            QComboBox:hover {
-                border-color: #60a5fa;
-            }
-            QComboBox:focus {
-                border-color: #3b82f6;
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 24px;
-            }
-            QComboBox QAbstractItemView {
-                color: #000000;
-                border: 1px solid #cbd5e1;
-                border-radius: 10px;
-                outline: none;
-            }
-            QComboBox QAbstractItemView::item {
-                background: #ffffff;
-                color: #000000;
-                padding: 1px 2px;
-                border: 2px solid #e5e7eb;
-                border-radius: 6px;
-            }
-            QComboBox QAbstractItemView::item:selected {
-                background: #e0f2fe;
-                color: #000000;
-            }
-        """
-
-        self.port_cb.setStyleSheet(combo_style)
-        self.baud_cb.setStyleSheet(combo_style)
-
         serial_section.addWidget(self.port_cb)
         serial_section.addWidget(self.baud_cb)
 
@@ -157,45 +274,7 @@ class RS485Monitor(QMainWindow):
         self.btn_scan = QPushButton("🔍 Scan Ports")
         self.btn_conn = QPushButton("🔌 Connect")
         self.btn_auto = QPushButton("⚡ Auto Connect")
-        
-        # Button styling
-        button_style = """
-            QPushButton {
-                background-color: #334155;
-                color: #e5e7eb;
-                border: none;
-                border-radius: 6px;
-                padding: 8px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #475569;
-            }
-            QPushButton:pressed {
-                background-color: #1e293b;
-            }
-        """
-        
-        auto_style = """
-            QPushButton {
-                background-color: #22c55e;
-                color: #ffffff;
-                border: none;
-                border-radius: 6px;
-                padding: 8px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #16a34a;
-            }
-            QPushButton:pressed {
-                background-color: #15803d;
-            }
-        """
-        
-        self.btn_scan.setStyleSheet(button_style)
-        self.btn_conn.setStyleSheet(button_style)
-        self.btn_auto.setStyleSheet(auto_style)
+        self.btn_auto.setProperty("variant", "go")
         
         for b in (self.btn_scan, self.btn_conn, self.btn_auto):
             b.setFixedHeight(40)
@@ -206,7 +285,7 @@ class RS485Monitor(QMainWindow):
         command_section.setSpacing(6)
         
         command_label = QLabel("COMMAND")
-        command_label.setStyleSheet(f"color:{self.MUTED}")
+        command_label.setProperty("role", "muted")
         command_section.addWidget(command_label)
         
         # Command buttons in a grid for better alignment
@@ -215,34 +294,8 @@ class RS485Monitor(QMainWindow):
         
         self.btn_rs = QPushButton("📤 Send 'rs'")
         self.btn_r = QPushButton("📤 Send 'r'")
-        
-        self.btn_rs.setStyleSheet("""
-            QPushButton {
-                background-color: #22c55e;
-                color: #ffffff;
-                border: none;
-                border-radius: 6px;
-                padding: 8px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #16a34a;
-            }
-        """)
-        
-        self.btn_r.setStyleSheet("""
-            QPushButton {
-                background-color: #fb923c;
-                color: #ffffff;
-                border: none;
-                border-radius: 6px;
-                padding: 8px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #ea580c;
-            }
-        """)
+        self.btn_rs.setProperty("variant", "go")
+        self.btn_r.setProperty("variant", "alt")
         
         for b in (self.btn_rs, self.btn_r):
             b.setFixedHeight(40)
@@ -251,6 +304,7 @@ class RS485Monitor(QMainWindow):
         command_grid.addWidget(self.btn_r, 0, 1)
         
         command_section.addLayout(command_grid)
+        self.command_grid = command_grid
 
         # Add all sections to side layout
         side_layout.addLayout(serial_section)
@@ -266,6 +320,7 @@ class RS485Monitor(QMainWindow):
         cards = QGridLayout()
         cards.setSpacing(12)
         main.addLayout(cards)
+        self.cards = cards
 
         self.v_lbl = self._card("Voltage", "V")
         self.i_lbl = self._card("Current", "mA")
@@ -276,19 +331,14 @@ class RS485Monitor(QMainWindow):
         cards.addWidget(self.p_lbl[0], 0, 2)
 
         self.log = QTextEdit()
+        self.log.setObjectName("log")
         self.log.setReadOnly(True)
-        self.log.setStyleSheet(
-            f"background:#020617;color:{self.TEXT};font-family:Consolas;border-radius:8px;padding:8px;"
-        )
         main.addWidget(self.log, 1)
 
-    def _card(self, title, unit):
+    def _card(self, title, unit, compact=False):
         frame = QFrame()
-        frame.setStyleSheet(f"""
-            background:{self.CARD};
-            border-radius:12px;
-        """)
-        frame.setMinimumHeight(220)
+        frame.setObjectName("card")
+        frame.setMinimumHeight(120 if compact else 220)
 
         # Create main layout for the frame
         main_layout = QVBoxLayout(frame)
@@ -307,14 +357,14 @@ class RS485Monitor(QMainWindow):
         # Title label
         t = QLabel(title)
         t.setFont(QFont("Segoe UI", 12))
-        t.setStyleSheet(f"color:{self.MUTED}; padding: 4px;")
+        t.setProperty("role", "cardText")
         t.setAlignment(Qt.AlignCenter)
         container_layout.addWidget(t)
 
         # Value label - this is the main number
         val = QLabel("--")
-        val.setFont(QFont("Segoe UI", 48, QFont.Bold))
-        val.setStyleSheet(f"color:{self.BLUE}; padding: 8px;")
+        val.setFont(QFont("Segoe UI", 28 if compact else 48, QFont.Bold))
+        val.setProperty("role", "cardValue")
         val.setAlignment(Qt.AlignCenter)
         val.setMinimumWidth(120)  # Ensure consistent width
         container_layout.addWidget(val)
@@ -322,7 +372,7 @@ class RS485Monitor(QMainWindow):
         # Unit label
         u = QLabel(unit)
         u.setFont(QFont("Segoe UI", 12))
-        u.setStyleSheet(f"color:{self.MUTED}; padding: 4px;")
+        u.setProperty("role", "cardText")
         u.setAlignment(Qt.AlignCenter)
         container_layout.addWidget(u)
         
@@ -340,24 +390,12 @@ class RS485Monitor(QMainWindow):
 
     def start_auto_connect(self):
         self.auto_connecting = True
+        self.auto_probed = set()
         self.btn_auto.setText("⏹️ Stop Auto Connect")
-        self.btn_auto.setStyleSheet("""
-            QPushButton {
-                background-color: #ef4444;
-                color: #ffffff;
-                border: none;
-                border-radius: 6px;
-                padding: 8px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #dc2626;
-            }
-        """)
+        self._set_prop(self.btn_auto, "variant", "stop")
         self._log("Auto-connect started")
         
         # Set up timer for auto-connect attempts
-        self.auto_timer.timeout.connect(self.auto_connect_attempt)
         self.auto_timer.start(2000)  # Try every 2 seconds
         
         # Try immediately
@@ -366,27 +404,21 @@ class RS485Monitor(QMainWindow):
     def stop_auto_connect(self):
         self.auto_connecting = False
         self.btn_auto.setText("⚡ Auto Connect")
-        self.btn_auto.setStyleSheet("""
-            QPushButton {
-                background-color: #22c55e;
-                color: #ffffff;
-                border: none;
-                border-radius: 6px;
-                padding: 8px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #16a34a;
-            }
-        """)
+        self._set_prop(self.btn_auto, "variant", "go")
         self.auto_timer.stop()
+        if self.detecting and not self.detect_manual:
+            self.detect_cancel.set()
         self._log("Auto-connect stopped")
 
     def auto_connect_attempt(self):
-        if self.ser and self.ser.is_open:
-            return  # Already connected
-            
-        ports = [p.device for p in serial.tools.list_ports.comports()]
+        if self.is_connected() or self.detecting:
+            return  # Already connected / detection still running
+
+        if self.baud_cb.currentText() == "Auto":
+            self._start_detect(None)
+            return
+
+        ports = list_ports()
         if not ports:
             self._log("Auto-connect: No ports available")
             return
@@ -411,101 +443,396 @@ class RS485Monitor(QMainWindow):
             except Exception as e:
                 continue
 
+    # ================= BAUD DETECT =================
+    def _start_detect(self, ports):
+        # Probing takes up to a second per port, so it runs off the GUI thread;
+        # ports=None means auto-connect: enumerate and try ports not probed yet
+        self.detecting = True
+        self.detect_manual = ports is not None
+        self.detect_cancel = threading.Event()
+        self.btn_conn.setEnabled(False)
+        threading.Thread(target=self._detect_worker, args=(ports, self.detect_cancel), daemon=True).start()
+
+    def _detect_worker(self, ports, cancel):
+        import rs485_baud  # optional subsystem, only loaded when used
+
+        if ports is None:
+            # Every probe writes "rs" at each rate, so don't keep poking
+            # unrelated devices: only ports that appeared since the last pass
+            found = list_ports()
+            ports = [p for p in found if p not in self.auto_probed]
+            self.auto_probed = set(found)
+            if ports:
+                self._emit(self.signals.log, f"Auto-connect: Probing {', '.join(ports)}")
+
+        failures = []
+
+        def report(r):
+            if r.baud:
+                self._emit(self.signals.log, f"Baud detect: {r.port} at {r.baud} ({r.elapsed * 1000:.0f} ms)")
+            elif r.error:
+                failures.append(r.error)
+                self._emit(self.signals.log, f"Baud detect: {r.error}")
+            else:
+                failures.append(f"No device answered on {r.port} at any baud rate")
+                self._emit(self.signals.log, f"Baud detect: no device on {r.port} ({r.elapsed * 1000:.0f} ms)")
+
+        try:
+            result = rs485_baud.detect_port_baud(
+                ports, on_result=report, rs485=self.rs485, cancel=cancel
+            )
+        except Exception as e:
+            failures.append(str(e))
+            self._emit(self.signals.log, f"Baud detect failed: {str(e)}")
+            result = None
+        if result:
+            self._emit(self.signals.detected, result.port, result.baud, "")
+        else:
+            self._emit(self.signals.detected, "", 0, "\n".join(failures) or "No ports available")
+
+    def _on_detected(self, port, baud, error):
+        self.detecting = False
+        self.btn_conn.setEnabled(True)
+        if not self.detect_manual and not self.auto_connecting:
+            return  # auto-connect was stopped while this pass ran
+        if not port:
+            if self.detect_manual:
+                QMessageBox.critical(self, "Connection Error", error)
+                self._log(f"Connection failed: {error}")
+            return
+        if self.is_connected():
+            return
+        if self.port_cb.findText(port) < 0:
+            self.port_cb.addItem(port)
+        self.port_cb.setCurrentText(port)
+        self.baud_cb.setCurrentText(str(baud))
+        self.connect()
+        if self.auto_connecting and self.is_connected():
+            self._log(f"Auto-connect: Connected to {port}")
+            self.stop_auto_connect()
+
     # ================= SERIAL =================
     def scan_ports(self):
+        if self.scanning:
+            return
+        self.scanning = True
+        self.btn_scan.setEnabled(False)
+        threading.Thread(target=self._scan_worker, daemon=True).start()
+
+    def _scan_worker(self):
+        try:
+            ports = list_ports()
+        except Exception as e:
+            self._emit(self.signals.log, f"Port scan failed: {str(e)}")
+            ports = []
+        self._emit(self.signals.ports, ports)
+
+    def _emit(self, signal, *args):
+        # For worker threads: the window may have closed while they ran
+        try:
+            signal.emit(*args)
+        except RuntimeError:
+            pass
+
+    def _on_ports(self, ports):
+        self.scanning = False
+        self.btn_scan.setEnabled(True)
+        current = self.port_cb.currentText()
         self.port_cb.clear()
-        ports = [p.device for p in serial.tools.list_ports.comports()]
         self.port_cb.addItems(ports)
+        if current in ports:
+            self.port_cb.setCurrentText(current)
         self._log(f"Scanned {len(ports)} ports")
 
+    def is_connected(self):
+        return self.acq is not None or bool(self.link and self.link.is_open)
+
     def toggle_connection(self):
-        if self.ser and self.ser.is_open:
+        if self.is_connected():
             self.disconnect()
         else:
             self.connect()
 
     def connect(self):
+        if self.baud_cb.currentText() == "Auto":
+            self._start_detect([self.port_cb.currentText()])
+            return
+        if self.acq_process:
+            self._connect_process()
+            return
         try:
-            self.ser = serial.Serial(
+            self.link = SerialLink(
                 self.port_cb.currentText(),
                 int(self.baud_cb.currentText()),
-                timeout=0.2
+                self.rs485,
+                on_line=self.signals.rx.emit,
+                on_sample=self._on_link_sample,
+                on_sent=lambda cmd, latency, depth: self.signals.log.emit(
+                    f"TX: {cmd} ({latency * 1000:.1f} ms, queue {depth})"
+                ),
+                on_error=lambda where, e: self.signals.link_error.emit(where, str(e)),
+                rx_buffer=self.rx_buffer,
+                low_latency=self.low_latency
             )
-            self.running = True
-            threading.Thread(target=self._reader, daemon=True).start()
-            self.status.setText("● Connected")
-            self.status.setStyleSheet(f"color:{self.GREEN}")
+            self.link.open()
+            for applied in self.link.tuned:
+                self._log(f"Port tuning: {applied}")
+            if self.rs485:
+                self._log("RS485 direction: " + ("software RTS" if self.link.tx.soft_rts else "driver RTS"))
+            self._set_status(True)
             self.btn_conn.setText("🔌 Disconnect")
+            self.stats_timer.start()
             self._log(f"Connected to {self.port_cb.currentText()}")
         except Exception as e:
+            self.link = None
             QMessageBox.critical(self, "Connection Error", str(e))
             self._log(f"Connection failed: {str(e)}")
 
     def disconnect(self):
-        self.running = False
-        if self.ser:
-            self.ser.close()
-        self.ser = None
-        self.status.setText("● Disconnected")
-        self.status.setStyleSheet(f"color:{self.RED}")
+        if self.analyzer:
+            self.stop_waveform()
+        stats = self._link_stats()
+        if stats and stats.lines:
+            self._log(f"Session integrity: {stats.summary()}")
+        self.stats_timer.stop()
+        self.integrity.setText("")
+        if self.link:
+            self.link.close()
+            tx = self.link.tx
+            if tx.depth:
+                self._log(f"TX: {tx.depth} queued command(s) not sent")
+            if tx.sent:
+                self._log(
+                    f"TX stats: {tx.sent} sent, {tx.coalesced} coalesced, "
+                    f"max queue {tx.max_depth}, max latency {tx.max_latency * 1000:.1f} ms"
+                )
+            self.link = None
+        if self.acq:
+            self.acq_timer.stop()
+            self.acq.stop()
+            self.acq = None
+        self._set_status(False)
         self.btn_conn.setText("🔌 Connect")
         
         # Reset display values
         self.v_lbl[1].setText("--")
         self.i_lbl[1].setText("--")
         self.p_lbl[1].setText("--")
+        if self.waveform:
+            for card in (self.pf_lbl, self.thd_lbl, self.flk_lbl):
+                card[1].setText("--")
         
         self._log("Disconnected")
 
     def send_cmd(self, cmd):
-        if self.ser and self.ser.is_open:
-            try:
-                self.ser.write((cmd + "\n").encode())
-                self._log(f"TX: {cmd}")
-            except Exception as e:
-                self._log(f"Send failed: {str(e)}")
-                self.disconnect()
+        if self.acq:
+            self.acq.send(cmd)
+        elif self.link and not self.link.send(cmd):
+            self._log(f"TX: {cmd} already queued")
+
+    def _on_link_sample(self, sample):
+        # Reader thread: fan out to sinks here, only the display hops to Qt
+        self.signals.sample.emit(sample)
+        for sink in self.sinks:
+            sink.publish(sample)
+
+    def _on_link_error(self, where, err):
+        if where == "read":
+            self._log(f"Read error: {err}")
+            return
+        self._log(f"Send failed: {err}")
+        if self.link:
+            self.disconnect()
 
-    def _reader(self):
-        buf = ""
-        while self.running:
-            try:
-                if self.ser and self.ser.in_waiting:
-                    buf += self.ser.read(self.ser.in_waiting).decode(errors="ignore")
-                    while "\n" in buf:
-                        line, buf = buf.split("\n", 1)
-                        self.signals.rx.emit(line.strip())
-                time.sleep(0.01)
-            except Exception as e:
-                if self.running:
-                    self._log(f"Read error: {str(e)}")
-                    break
+    # ================= ACQUISITION PROCESS =================
+    def _connect_process(self):
+        import rs485_acq  # optional subsystem, only loaded when enabled
 
-    # ================= PARSER =================
-    def _parse(self, line):
-        try:
-            if "," in line:
-                parts = line.split(",")
-                if len(parts) >= 3:
-                    v, i, p = map(float, parts[:3])
-                    self.v_lbl[1].setText(f"{v:.2f}")
-                    self.i_lbl[1].setText(f"{i:.3f}")
-                    self.p_lbl[1].setText(f"{p:.2f}")
+        port = self.port_cb.currentText()
+        self.acq = rs485_acq.AcquisitionProcess(
+            port, int(self.baud_cb.currentText()), self.rs485, self.rx_buffer, self.low_latency
+        )
+        self.acq_opened = False
+        self.acq_lost = 0
+        self.acq_stats = None
+        self.acq.start()
+        self.acq_timer.start()
+        self.stats_timer.start()
+        self._set_status(True)
+        self.btn_conn.setText("🔌 Disconnect")
+        self._log(f"Acquisition process started for {port}")
+
+    def _poll_acq(self):
+        samples, events = self.acq.poll()
+        for kind, text in events:
+            if kind == "rx":
+                self._log("RX: " + text)
+            elif kind == "tx":
+                self._log("TX: " + text)
+            elif kind == "log":
+                self._log(text)
+            elif kind == "stats":
+                self.acq_stats = text
+            elif kind == "open":
+                self.acq_opened = True
+                self._log(f"Connected to {text}")
+            elif kind == "error" and not self.acq_opened:
+                self.disconnect()
+                QMessageBox.critical(self, "Connection Error", text)
+                self._log(f"Connection failed: {text}")
                 return
+            elif kind == "error":
+                self._log(f"Read error: {text}")
+            elif kind == "send_error":
+                self._log(f"Send failed: {text}")
+
+        if samples:
+            for sink in self.sinks:
+                for sample in samples:
+                    sink.publish(sample)
+            self._show(merge(samples))
+
+        if self.acq.ring.lost != self.acq_lost:
+            self._log(f"Acquisition ring overrun: {self.acq.ring.lost - self.acq_lost} samples lost")
+            self.acq_lost = self.acq.ring.lost
+
+        reason = self.acq.check()
+        if reason:
+            self._log(reason.capitalize())
+
+    # ================= WAVEFORM =================
+    def _wave_ui(self):
+        self.btn_wave = QPushButton("〰 Stream Waveform")
+        self.btn_wave.setFixedHeight(40)
+        self.command_grid.addWidget(self.btn_wave, 1, 0, 1, 2)
+
+        self.pf_lbl = self._card("Power Factor", "", compact=True)
+        self.thd_lbl = self._card("THD (I)", "%", compact=True)
+        self.flk_lbl = self._card("Flicker", "%", compact=True)
+        self.cards.addWidget(self.pf_lbl[0], 1, 0)
+        self.cards.addWidget(self.thd_lbl[0], 1, 1)
+        self.cards.addWidget(self.flk_lbl[0], 1, 2)
+
+    def toggle_waveform(self):
+        if self.analyzer:
+            self.stop_waveform()
+        else:
+            self.start_waveform()
 
-            m = re.search(r"([VIA]|P)\s*=?\s*([-+]?\d*\.?\d+)", line)
-            if not m:
-                return
+    def start_waveform(self):
+        if not self.link:
+            self._log("Waveform: connect first (not available with --acq-process)")
+            return
+        try:
+            import rs485_wave  # optional subsystem, needs numpy
+        except ImportError as e:
+            self._log(f"Waveform unavailable: {str(e)}")
+            return
+        self.analyzer = rs485_wave.Analyzer(self._on_wave)
+        self.analyzer.start()
+        self.link.wave = self.analyzer.reader
+        self.link.send(rs485_wave.START_CMD)
+        self.btn_wave.setText("⏹️ Stop Waveform")
+        self._set_prop(self.btn_wave, "variant", "stop")
+
+    def stop_waveform(self):
+        import rs485_wave
+
+        analyzer, reader = self.analyzer, self.analyzer.reader
+        if self.link:
+            self.link.send(rs485_wave.STOP_CMD)
+            # The reader stays on until the burst in flight is over and the
+            # link is back to text; the link then drops it itself
+            reader.drain()
+        self.analyzer.stop()
+        self.analyzer = None
+        self.btn_wave.setText("〰 Stream Waveform")
+        self._set_prop(self.btn_wave, "variant", None)
+        self._log(
+            f"Waveform: {reader.bursts} bursts, {reader.bad} bad, "
+            f"{reader.dropped} dropped (analysis behind)"
+        )
+        if analyzer.errors:
+            self._log(f"Waveform: {analyzer.errors} bursts failed analysis ({analyzer.last_error})")
+
+    def _on_wave(self, res):
+        # Analyzer thread: true-RMS values feed the normal sample path too
+        self._on_link_sample(Sample(time.time(), res["vrms"], res["irms"], res["p"], None))
+        self.signals.wave.emit(res)
+
+    def _show_wave(self, res):
+        self.pf_lbl[1].setText(f"{res['pf']:.3f}")
+        self.thd_lbl[1].setText(f"{res['thd_i'] * 100:.1f}")
+        self.flk_lbl[1].setText(f"{res['flicker_pct']:.1f}")
+        self.pf_lbl[1].setToolTip(f"S = {res['s']:.2f} VA, f = {res['f0']:.1f} Hz")
+        self.thd_lbl[1].setToolTip(f"THD (V) = {res['thd_v'] * 100:.1f} %")
+        self.flk_lbl[1].setToolTip(f"Voltage fluctuation = {res['dv_pct']:.2f} %")
+
+    # ================= INTEGRITY =================
+    def _link_stats(self):
+        if self.link:
+            return self.link.stats
+        if self.acq:
+            return self.acq_stats
+        return None
+
+    def _show_integrity(self):
+        stats = self._link_stats()
+        if not stats:
+            return
+        text = f"{stats.lines} lines · loss {stats.loss_rate:.2%}"
+        if stats.seq_gaps:
+            text += f" · {stats.seq_lost} missed"
+        text += f" · buf {stats.waiting_max} B"
+        self.integrity.setText(text)
+        self.integrity.setToolTip(stats.summary())
+        lossy = "lossy" if stats.bad or stats.seq_lost else "ok"
+        if self.integrity.property("state") != lossy:
+            self._set_prop(self.integrity, "state", lossy)
+
+    # ================= DISPLAY =================
+    def _show(self, sample):
+        if sample.v is not None:
+            self.v_lbl[1].setText(f"{sample.v:.2f}")
+        if sample.i is not None:
+            self.i_lbl[1].setText(f"{sample.i:.3f}")
+        if sample.p is not None:
+            self.p_lbl[1].setText(f"{sample.p:.2f}")
+
+    # ================= IPC =================
+    def start_ipc(self, address=""):
+        import rs485_ipc  # optional subsystem, only loaded when enabled
+
+        # Subscriber commands arrive on the publisher thread; hop to the GUI
+        # thread so they go through the same send_cmd as the buttons
+        self.signals.cmd.connect(self.send_cmd)
+        self.ipc = rs485_ipc.Publisher(
+            rs485_ipc.parse_address(address),
+            on_command=self.signals.cmd.emit
+        )
+        try:
+            self.ipc.start()
+        except OSError as e:
+            self._log(f"IPC publisher failed: {str(e)}")
+            self.ipc = None
+            return
+        self.sinks += (self.ipc,)
+        self._log(f"IPC publisher on {self.ipc.address}")
 
-            k, v = m.group(1), float(m.group(2))
-            if k == "V":
-                self.v_lbl[1].setText(f"{v:.2f}")
-            elif k in ("I", "A"):
-                self.i_lbl[1].setText(f"{v:.3f}")
-            elif k == "P":
-                self.p_lbl[1].setText(f"{v:.2f}")
-        except:
-            pass
+    # ================= HTTP API =================
+    def start_http(self, address=""):
+        import rs485_http  # optional subsystem, only loaded when enabled
+
+        try:
+            self.http = rs485_http.HttpApi(rs485_http.parse_address(address))
+            self.http.start()
+        except (OSError, ValueError) as e:
+            self._log(f"HTTP API failed: {str(e)}")
+            self.http = None
+            return
+        self.sinks += (self.http,)
+        host, port = self.http.address
+        self._log(f"HTTP API on http://{host}:{port}/api/latest")
 
     # ================= LOG =================
     def _log(self, msg):
@@ -519,25 +846,88 @@ class RS485Monitor(QMainWindow):
         self.btn_auto.clicked.connect(self.toggle_auto_connect)
         self.btn_rs.clicked.connect(lambda: self.send_cmd("rs"))
         self.btn_r.clicked.connect(lambda: self.send_cmd("r"))
+        self.auto_timer.timeout.connect(self.auto_connect_attempt)
+        self.acq_timer.timeout.connect(self._poll_acq)
+        self.stats_timer.timeout.connect(self._show_integrity)
         
         self.signals.rx.connect(self._on_rx)
+        self.signals.sample.connect(self._show)
+        self.signals.log.connect(self._log)
+        self.signals.link_error.connect(self._on_link_error)
+        self.signals.detected.connect(self._on_detected)
+        if self.waveform:
+            self.btn_wave.clicked.connect(self.toggle_waveform)
+            self.signals.wave.connect(self._show_wave)
+        self.signals.ports.connect(self._on_ports)
 
     def _on_rx(self, line):
         self._log("RX: " + line)
-        self._parse(line)
 
     def closeEvent(self, event):
         """Clean up on window close"""
         if self.auto_connecting:
             self.stop_auto_connect()
-        if self.ser:
+        if self.is_connected():
             self.disconnect()
+        for sink in self.sinks:
+            sink.stop()
         event.accept()
 
 
+# ================= STARTUP BENCH =================
+def bench_startup(app, budget_ms):
+    """Report time to first event-loop turn with the window shown; exit
+    non-zero when it exceeds budget_ms so CI/scripts can catch regressions."""
+    def done():
+        ms = (time.perf_counter() - _T0) * 1000
+        print(f"startup: {ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        app.exit(0 if ms <= budget_ms else 1)
+    QTimer.singleShot(0, done)
+
+
 # ================= RUN =================
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="RS485 Power Monitor")
+    ap.add_argument("--bench-startup", nargs="?", const=1000.0, type=float,
+                    metavar="BUDGET_MS", help="print startup time and exit")
+    ap.add_argument("--ipc", nargs="?", const="", metavar="ADDRESS",
+                    help="publish samples to local subscribers "
+                         "(socket path or host:port, default per platform)")
+    ap.add_argument("--http", nargs="?", const="", metavar="[HOST][:PORT]",
+                    help="serve REST/WebSocket API (default 127.0.0.1:8485)")
+    ap.add_argument("--acq-process", action="store_true",
+                    help="run serial acquisition in a separate process")
+    ap.add_argument("--rs485", action="store_true",
+                    help="drive RS485 DE/RE from RTS around each transmit")
+    ap.add_argument("--tx-delays", nargs=2, type=float, default=[0.0, 0.0],
+                    metavar=("BEFORE_MS", "AFTER_MS"),
+                    help="RS485 turnaround delays around each transmit")
+    ap.add_argument("--rx-buffer", type=int, metavar="BYTES",
+                    help="request a larger driver receive buffer (Windows)")
+    ap.add_argument("--low-latency", action="store_true",
+                    help="set the driver's low-latency flag (Linux)")
+    ap.add_argument("--waveform", action="store_true",
+                    help="enable raw waveform streaming with PF/THD/flicker (needs numpy)")
+    # Leave anything unknown (e.g. -style) to Qt
+    return ap.parse_known_args(argv)
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    win = RS485Monitor()
+    args, qt_args = parse_args(sys.argv[1:])
+    app = QApplication(sys.argv[:1] + qt_args)
+    rs485 = tuple(ms / 1000 for ms in args.tx_delays) if args.rs485 else None
+    win = RS485Monitor(
+        acq_process=args.acq_process,
+        rs485=rs485,
+        rx_buffer=args.rx_buffer,
+        low_latency=args.low_latency,
+        waveform=args.waveform
+    )
     win.show()
+    if args.ipc is not None:
+        win.start_ipc(args.ipc)
+    if args.http is not None:
+        win.start_http(args.http)
+    if args.bench_startup is not None:
+        bench_startup(app, args.bench_startup)
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,250 @@
+import math, queue, struct, time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from rs485_core import Sample, LineFramer, TxQueue, tune_port
+
+
+# ================= SHARED RING =================
+# Header: total samples written, writer heartbeat counter (padded to 64 B).
+# Slot:   sequence number of the sample stored there, then t/v/i/p and up
+#         to 16 bytes of class text. NaN = field not sent.
+HEADER = struct.Struct("<QQ")
+HEADER_SIZE = 64
+SLOT = struct.Struct("<Qdddd16s")
+RING_SLOTS = 65536
+
+STALE_AFTER = 2.0     # seconds without a heartbeat before the writer is presumed hung
+START_TIMEOUT = 15.0  # first heartbeat may take a while (spawn re-imports the app)
+RESTART_DELAY = 1.0   # seconds between restart attempts
+EVENTS_MAX = 2000     # queued log events before the writer starts dropping them
+
+
+def _nan(x):
+    return math.nan if x is None else x
+
+
+def _none(x):
+    return None if math.isnan(x) else x
+
+
+class SampleRing:
+    """Single-writer / single-reader sample ring in shared memory.
+
+    The writer never waits for the reader; a reader that falls more than
+    one ring behind skips ahead and counts what it missed in `lost`.
+    """
+
+    def __init__(self, name=None, slots=RING_SLOTS):
+        size = HEADER_SIZE + slots * SLOT.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.slots = slots
+        self.buf = self.shm.buf
+        self.read_seq = self.header()[0]
+        self.lost = 0
+
+    def header(self):
+        return HEADER.unpack_from(self.buf, 0)
+
+    # ---------- writer side ----------
+    def write(self, seq, s):
+        off = HEADER_SIZE + (seq % self.slots) * SLOT.size
+        cls = (s.cls or "").encode()[:16]
+        SLOT.pack_into(self.buf, off, seq + 1, s.t, _nan(s.v), _nan(s.i), _nan(s.p), cls)
+        return seq + 1
+
+    def commit(self, seq, heartbeat):
+        HEADER.pack_into(self.buf, 0, seq, heartbeat)
+
+    # ---------- reader side ----------
+    def read_new(self):
+        written = self.header()[0]
+        if written - self.read_seq > self.slots:
+            self.lost += written - self.read_seq - self.slots
+            self.read_seq = written - self.slots
+        out = []
+        for seq in range(self.read_seq, written):
+            off = HEADER_SIZE + (seq % self.slots) * SLOT.size
+            tag, t, v, i, p, cls = SLOT.unpack_from(self.buf, off)
+            if tag != seq + 1:
+                self.lost += 1  # overwritten while we were reading
+                continue
+            out.append(Sample(t, _none(v), _none(i), _none(p), cls.rstrip(b"\0").decode(errors="replace") or None))
+        # The writer may have lapped us mid-read; anything it reached is suspect
+        if self.header()[0] - self.read_seq > self.slots:
+            self.lost += len(out)
+            out = []
+        self.read_seq = written
+        return out
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# ================= WRITER PROCESS =================
+def _run(port, baud, rs485, tuning, ring_name, slots, cmds, events):
+    import serial
+
+    def event(kind, text):
+        try:
+            events.put_nowait((kind, text))
+        except queue.Full:
+            pass  # the GUI is behind; losing log lines is fine, losing samples is not
+
+    ring = SampleRing(ring_name, slots)
+    seq, beat = ring.header()
+    try:
+        ser = serial.Serial(port, baud, timeout=0.05)
+    except Exception as e:
+        event("error", str(e))
+        return
+    event("open", port)
+    for applied in tune_port(ser, *tuning):
+        event("log", f"Port tuning: {applied}")
+
+    tx = TxQueue(
+        ser,
+        rs485,
+        on_sent=lambda cmd, latency, depth: event("tx", f"{cmd} ({latency * 1000:.1f} ms, queue {depth})")
+    )
+    tx.start()
+    if rs485:
+        event("log", "RS485 direction: " + ("software RTS" if tx.soft_rts else "driver RTS"))
+
+    parent = mp.parent_process()
+    next_check = time.monotonic() + 1.0
+    framer = LineFramer()
+    try:
+        while True:
+            if tx.error is not None:
+                # The writer is gone; exit so check() restarts us with a fresh one
+                event("send_error", str(tx.error))
+                return
+            beat += 1
+            waiting = ser.in_waiting
+            data = ser.read(waiting or 1)
+            if data:
+                for line, sample in framer.feed(data, waiting):
+                    event("rx", line)
+                    if sample:
+                        seq = ring.write(seq, sample)
+            ring.commit(seq, beat)
+
+            while True:
+                try:
+                    cmd = cmds.get_nowait()
+                except queue.Empty:
+                    break
+                if cmd is None:
+                    return
+                if not tx.put(cmd):
+                    event("log", f"TX: {cmd} already queued")
+
+            now = time.monotonic()
+            if now > next_check:
+                next_check = now + 1.0
+                event("stats", framer.stats)
+                if parent is not None and not parent.is_alive():
+                    return  # GUI died; release the port for the next instance
+    except Exception as e:
+        event("error", str(e))
+    finally:
+        tx.stop()
+        ser.close()
+        ring.close()
+
+
+# ================= GUI SIDE =================
+class AcquisitionProcess:
+    """Runs the serial reader/framer/parser for one port in a child process
+    and exposes its samples through a SampleRing. One instance per port,
+    so multi-port setups spread over cores.
+
+    check() detects a dead or hung writer and restarts it on the same ring.
+    """
+
+    def __init__(self, port, baud, rs485=None, rx_buffer=None, low_latency=False, slots=RING_SLOTS):
+        self.port = port
+        self.baud = baud
+        self.rs485 = rs485
+        self.tuning = (rx_buffer, low_latency)
+        self.ctx = mp.get_context("spawn")  # never fork a process that runs Qt
+        self.ring = SampleRing(slots=slots)
+        self.proc = None
+        self.restarts = 0
+        self._beat = None
+        self._beat_at = 0.0
+        self._running = False
+        self._restart_at = None
+
+    def start(self):
+        self.cmds = self.ctx.Queue()
+        self.events = self.ctx.Queue(EVENTS_MAX)
+        self.proc = self.ctx.Process(
+            target=_run,
+            args=(self.port, self.baud, self.rs485, self.tuning, self.ring.name, self.ring.slots, self.cmds, self.events),
+            name=f"rs485-acq-{self.port}",
+            daemon=True
+        )
+        self.proc.start()
+        self._beat = self.ring.header()[1]
+        self._beat_at = time.monotonic()
+        self._running = False
+        self._restart_at = None
+
+    def stop(self):
+        if self.proc and self.proc.is_alive():
+            self.cmds.put(None)
+            self.proc.join(1.0)
+            if self.proc.is_alive():
+                self.proc.terminate()
+                self.proc.join(1.0)
+        self.proc = None
+        self.ring.close(unlink=True)
+
+    def send(self, cmd):
+        self.cmds.put(cmd)
+
+    def poll(self, max_events=500):
+        """Return (new samples, [(kind, text), ...]) without blocking."""
+        events = []
+        while len(events) < max_events:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return self.ring.read_new(), events
+
+    def check(self):
+        """Return a reason string if the writer had to be (re)started."""
+        now = time.monotonic()
+        if self._restart_at is not None:
+            if now < self._restart_at:
+                return None
+            self.restarts += 1
+            self.start()
+            return f"acquisition restarted (#{self.restarts})"
+
+        beat = self.ring.header()[1]
+        if beat != self._beat:
+            self._beat, self._beat_at = beat, now
+            self._running = True
+
+        if not self.proc.is_alive():
+            reason = f"acquisition process exited (code {self.proc.exitcode})"
+        elif now - self._beat_at > (STALE_AFTER if self._running else START_TIMEOUT):
+            reason = "acquisition process stopped responding"
+            self.proc.terminate()
+            self.proc.join(1.0)
+        else:
+            return None
+        self._restart_at = now + RESTART_DELAY
+        return reason
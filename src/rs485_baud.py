@@ -0,0 +1,103 @@
+import time
+from collections import namedtuple
+
+from rs485_core import parse_line, TEXT, direction_control, write_frame
+
+
+RATES = (115200, 57600, 38400, 19200, 9600)
+WINDOW = 0.15      # seconds to listen at each rate
+PROBE = "rs"       # sent at each rate; the ESP32 only answers at the right one
+MIN_LINES = 2      # single-field ("V=..") lines needed to stop early
+CLEAR = 0.9        # score that, with one CSV line or MIN_LINES, ends the search
+ACCEPT = 0.5       # best score still accepted once every rate was tried
+
+# Anything outside TEXT (0x00/0xFF from framing errors and breaks,
+# high-bit noise) counts against a rate
+STREAM = TEXT + b"\n"
+
+# error: why the port couldn't be probed (baud is None then)
+Detected = namedtuple("Detected", "port baud scores elapsed error", defaults=(None,))
+
+
+def score(data):
+    """Score bytes received at one rate: (0..1, parseable lines, of which
+    full V,I,P CSV lines).
+
+    Weighs the share of bytes that are plain text against the share of
+    complete lines that parse as CSV / "V=" measurements."""
+    if not data:
+        return 0.0, 0, 0
+    valid = 1 - len(data.translate(None, STREAM)) / len(data)
+    lines = data.split(b"\n")[:-1]
+    good = csv = 0
+    for raw in lines:
+        if raw.translate(None, TEXT):
+            continue
+        s = parse_line(raw.decode().strip())
+        if s:
+            good += 1
+            if None not in (s.v, s.i, s.p):
+                csv += 1
+    matched = good / len(lines) if lines else 0.0
+    return 0.4 * valid + 0.6 * matched, good, csv
+
+
+def detect_baud(port, rates=RATES, probe=PROBE, window=WINDOW, rs485=None, cancel=None):
+    """Try each rate on one port; returns Detected (baud None if no match).
+
+    rs485 is the (before, after) delay pair used for TxQueue, so the probe
+    drives DE/RE the same way. Setting the `cancel` Event stops between
+    rates."""
+    import serial
+
+    started = time.monotonic()
+    scores = {}
+    with serial.Serial(port, rates[0], timeout=0.02) as ser:
+        soft_rts = direction_control(ser, rs485)
+        for rate in rates:
+            if cancel is not None and cancel.is_set():
+                break
+            ser.baudrate = rate
+            ser.reset_input_buffer()
+            if probe:
+                write_frame(ser, (probe + "\n").encode(), soft_rts)
+            data = b""
+            deadline = time.monotonic() + window
+            while time.monotonic() < deadline:
+                data += ser.read(ser.in_waiting or 1)
+                s, good, csv = score(data)
+                if (csv or good >= MIN_LINES) and s >= CLEAR:
+                    scores[rate] = s
+                    return Detected(port, rate, scores, time.monotonic() - started)
+            scores[rate], good, _ = score(data)
+            if not good:
+                scores[rate] = min(scores[rate], ACCEPT - 0.01)  # text alone isn't a device
+
+    if not scores:
+        return Detected(port, None, scores, time.monotonic() - started)
+    best = max(scores, key=scores.get)
+    baud = best if scores[best] >= ACCEPT else None
+    return Detected(port, baud, scores, time.monotonic() - started)
+
+
+def detect_port_baud(ports, rates=RATES, probe=PROBE, window=WINDOW, on_result=None,
+                     rs485=None, cancel=None):
+    """Find the first (port, baud) pair with a device answering in our line
+    format, in one pass over the ports. Ports that can't be opened are
+    skipped and reported with Detected.error set. Returns None when
+    nothing answered or `cancel` was set."""
+    for port in ports:
+        if cancel is not None and cancel.is_set():
+            return None
+        started = time.monotonic()
+        try:
+            result = detect_baud(port, rates, probe, window, rs485, cancel)
+        except Exception as e:
+            result = Detected(port, None, {}, time.monotonic() - started, str(e) or type(e).__name__)
+        if cancel is not None and cancel.is_set():
+            return None
+        if on_result:
+            on_result(result)
+        if result.baud:
+            return result
+    return None
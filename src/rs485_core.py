@@ -0,0 +1,448 @@
+import re, time, threading
+from collections import deque, namedtuple
+
+
+# ================= SAMPLE =================
+# One parsed measurement. Fields the device did not send on that line are
+# None ("V=230.1" only fills v); t is the host receive time (time.time()).
+Sample = namedtuple("Sample", "t v i p cls")
+
+VALUE_RE = re.compile(r"([VIA]|P)\s*=?\s*([-+]?\d*\.?\d+)")
+SEQ_RE = re.compile(r"#(\d+)[\s,]+")  # optional device counter: "#1042 230.1,12.5,2.87"
+
+
+# ================= PARSER =================
+def parse_line(line, t=None):
+    """Parse one line from the ESP32 into a Sample, or None if it holds no
+    measurement. Accepts "V,I,P[,class]" CSV or a single "V=.."/"I=.."/
+    "A=.."/"P=.." field, optionally prefixed by a "#<seq>" counter."""
+    t = time.time() if t is None else t
+    m = SEQ_RE.match(line)
+    if m:
+        line = line[m.end():]
+    try:
+        if "," in line:
+            parts = line.split(",")
+            if len(parts) < 3:
+                return None
+            v, i, p = map(float, parts[:3])
+            cls = (parts[3].strip() or None) if len(parts) > 3 else None
+            return Sample(t, v, i, p, cls)
+
+        m = VALUE_RE.search(line)
+        if not m:
+            return None
+
+        k, x = m.group(1), float(m.group(2))
+        if k == "V":
+            return Sample(t, x, None, None, None)
+        if k in ("I", "A"):
+            return Sample(t, None, x, None, None)
+        return Sample(t, None, None, x, None)
+    except ValueError:
+        return None
+
+
+def merge(samples):
+    """Collapse a batch into one Sample holding the newest value of each field."""
+    t = v = i = p = cls = None
+    for s in samples:
+        t = s.t
+        v = s.v if s.v is not None else v
+        i = s.i if s.i is not None else i
+        p = s.p if s.p is not None else p
+        cls = s.cls if s.cls is not None else cls
+    return Sample(t, v, i, p, cls)
+
+
+# ================= INTEGRITY =================
+# Bytes a correctly framed line can contain
+TEXT = bytes(range(0x20, 0x7F)) + b"\t\r"
+MAX_LINE = 128  # longer than any real line: two lines glued by a lost "\n"
+
+
+class LinkStats:
+    """Integrity counters for one session on one port.
+
+    corrupt    line had non-text bytes (framing errors, noise, baud mismatch)
+    oversize   line longer than MAX_LINE, usually lines glued together
+    truncated  CSV line with fewer than V,I,P fields
+    malformed  CSV line whose V,I,P don't parse
+    seq_lost   lines missing between "#<seq>" counters (seq_gaps gaps)
+    waiting_max  highest in_waiting seen, i.e. how close the OS buffer got to full
+    """
+
+    COUNTERS = ("bytes", "lines", "samples", "corrupt", "oversize", "truncated",
+                "malformed", "seq_gaps", "seq_lost", "waiting_max")
+
+    def __init__(self):
+        for k in self.COUNTERS:
+            setattr(self, k, 0)
+        self.last_seq = None
+        self.started = time.time()
+
+    @property
+    def bad(self):
+        return self.corrupt + self.oversize + self.truncated + self.malformed
+
+    @property
+    def loss_rate(self):
+        total = self.lines + self.seq_lost
+        return (self.bad + self.seq_lost) / total if total else 0.0
+
+    def note_seq(self, seq):
+        if self.last_seq is not None and seq > self.last_seq + 1:
+            self.seq_gaps += 1
+            self.seq_lost += seq - self.last_seq - 1
+        self.last_seq = seq  # a lower value is a device reset/wrap: resync
+
+    def as_dict(self):
+        d = {k: getattr(self, k) for k in self.COUNTERS}
+        d.update(bad=self.bad, loss_rate=self.loss_rate)
+        return d
+
+    def summary(self):
+        return (
+            f"{self.lines} lines, {self.samples} samples, {self.bad} bad "
+            f"({self.corrupt} corrupt, {self.truncated} truncated, "
+            f"{self.malformed} malformed, {self.oversize} oversize), "
+            f"{self.seq_lost} lost in {self.seq_gaps} gaps, "
+            f"loss {self.loss_rate:.2%}, max in_waiting {self.waiting_max} B"
+        )
+
+
+class LineFramer:
+    """Turns raw bytes into (line, sample) pairs, keeping LinkStats.
+    Damaged lines are passed on for logging but never yield a sample."""
+
+    def __init__(self):
+        self.buf = b""
+        self.stats = LinkStats()
+
+    def feed(self, data, waiting=0):
+        st = self.stats
+        st.bytes += len(data)
+        st.waiting_max = max(st.waiting_max, waiting)
+        self.buf += data
+        out = []
+        while b"\n" in self.buf:
+            raw, self.buf = self.buf.split(b"\n", 1)
+            line = raw.decode(errors="replace").strip()
+            out.append((line, self._check(raw, line)))
+        if len(self.buf) > 4 * MAX_LINE:
+            st.oversize += 1  # no newline for far too long; resync
+            self.buf = b""
+        return out
+
+    def _check(self, raw, line):
+        st = self.stats
+        if not line:
+            return None
+        st.lines += 1
+        if raw.translate(None, TEXT):
+            st.corrupt += 1
+            return None
+        if len(raw) > MAX_LINE:
+            st.oversize += 1
+            return None
+
+        m = SEQ_RE.match(line)
+        if m:
+            st.note_seq(int(m.group(1)))
+        sample = parse_line(line)
+        if "," in line:
+            fields = line[m.end():].count(",") + 1 if m else line.count(",") + 1
+            if fields < 3:
+                st.truncated += 1
+                return None
+            if sample is None:
+                st.malformed += 1
+                return None
+        if sample:
+            st.samples += 1
+        return sample
+
+
+def tune_port(ser, rx_buffer=None, low_latency=False):
+    """Best-effort driver tuning; returns the settings that took effect."""
+    applied = []
+    if rx_buffer and hasattr(ser, "set_buffer_size"):  # Windows only
+        try:
+            ser.set_buffer_size(rx_size=rx_buffer)
+            applied.append(f"rx buffer {rx_buffer} B")
+        except Exception:
+            pass
+    if low_latency:
+        try:
+            import fcntl, struct, termios
+            # struct serial_struct: flags is the 5th int; ASYNC_LOW_LATENCY = 1 << 13
+            buf = bytearray(fcntl.ioctl(ser.fileno(), termios.TIOCGSERIAL, bytes(64)))
+            flags, = struct.unpack_from("i", buf, 16)
+            struct.pack_into("i", buf, 16, flags | 0x2000)
+            fcntl.ioctl(ser.fileno(), termios.TIOCSSERIAL, bytes(buf))
+            applied.append("low latency")
+        except Exception:
+            pass
+    return applied
+
+
+# ================= RS485 DIRECTION =================
+def enable_rs485(ser, before=0.0, after=0.0):
+    """Have the driver drive DE/RE from RTS around each write (delays in
+    seconds). Returns False when the kernel/driver can't do it, in which
+    case TxQueue toggles RTS itself."""
+    import serial.rs485
+    try:
+        ser.rs485_mode = serial.rs485.RS485Settings(
+            rts_level_for_tx=True,
+            rts_level_for_rx=False,
+            delay_before_tx=before,
+            delay_before_rx=after
+        )
+        return True
+    except (ValueError, OSError, NotImplementedError):
+        ser.rs485_mode = None
+        return False
+
+
+def direction_control(ser, rs485):
+    """Set up direction control for a (before, after) delay pair, or
+    nothing for None. Returns the delays write_frame() must apply itself
+    (software RTS), or None when the driver handles it."""
+    if rs485 is None:
+        return None
+    before, after = rs485
+    if enable_rs485(ser, before, after):
+        return None
+    ser.rts = False
+    return (before, after)
+
+
+def write_frame(ser, data, soft_rts=None):
+    """Write data and wait until it is on the wire, raising RTS around it
+    when soft_rts is a (before, after) delay pair."""
+    if soft_rts is None:
+        ser.write(data)
+        ser.flush()
+        return
+    before, after = soft_rts
+    ser.rts = True
+    if before:
+        time.sleep(before)
+    ser.write(data)
+    ser.flush()  # wait until the last byte is on the wire
+    if after:
+        time.sleep(after)
+    ser.rts = False
+
+
+# ================= TX QUEUE =================
+DRAIN_TIMEOUT = 1.0  # seconds stop() waits for queued commands to go out
+
+
+class TxQueue:
+    """Owns all writes to one port on a dedicated thread.
+
+    put() never blocks; a command that is already waiting to be sent is
+    not queued twice. When rs485 is a (before, after) delay pair the port
+    is switched to RS485 direction control (kernel RTS handling if
+    available, otherwise RTS is toggled here with the same delays).
+
+    on_sent(cmd, latency_s, depth) and on_error(exc) are called from the
+    writer thread. After a write error the writer stops; `error` holds
+    the exception and nothing else is sent.
+    """
+
+    def __init__(self, ser, rs485=None, on_sent=None, on_error=None):
+        self.ser = ser
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.sent = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.last_latency = None
+        self.max_latency = 0.0
+        self.error = None
+        self._pending = deque()  # (cmd, queued_at)
+        self._queued = set()
+        self._busy = False       # a popped command is being written
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.soft_rts = direction_control(ser, rs485)
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    @property
+    def idle(self):
+        return not self._pending and not self._busy
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._writer, name="tx-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=DRAIN_TIMEOUT):
+        """Send what is still queued, then end the writer. Waits at most
+        `timeout` s; returns False if commands were left unsent."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        return self.error is None and self.idle
+
+    def flush(self, timeout=DRAIN_TIMEOUT):
+        """Wait until every queued command is written; False on timeout or
+        a write error."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.idle or self.error is not None, timeout)
+            return self.error is None and self.idle
+
+    def put(self, cmd):
+        """Queue cmd; returns False if an identical command was already pending."""
+        with self._cond:
+            if cmd in self._queued:
+                self.coalesced += 1
+                return False
+            self._queued.add(cmd)
+            self._pending.append((cmd, time.perf_counter()))
+            self.max_depth = max(self.max_depth, len(self._pending))
+            self._cond.notify()
+            return True
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running)
+                if not self._pending:
+                    return  # stopped and drained
+                cmd, queued_at = self._pending.popleft()
+                self._queued.discard(cmd)
+                self._busy = True
+            try:
+                write_frame(self.ser, (cmd + "\n").encode(), self.soft_rts)
+            except Exception as e:
+                with self._cond:
+                    self.error = e
+                    self._busy = False
+                    self._cond.notify_all()
+                if self.on_error:
+                    self.on_error(e)
+                return
+            latency = time.perf_counter() - queued_at
+            with self._cond:
+                self.sent += 1
+                self._busy = False
+                self._cond.notify_all()
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            if self.on_sent:
+                self.on_sent(cmd, latency, self.depth)
+
+
+# ================= SERIAL LINK =================
+class SerialLink:
+    """One open port: a reader thread that frames and parses lines, and a
+    TxQueue for commands. Shared by the GUI and the headless runner.
+
+    Callbacks run on the reader/writer threads:
+        on_line(line), on_sample(sample), on_sent(cmd, latency_s, depth),
+        on_error(where, exc) with where in ("read", "send")
+    """
+
+    def __init__(self, port, baud, rs485=None, on_line=None, on_sample=None,
+                 on_sent=None, on_error=None, rx_buffer=None, low_latency=False):
+        self.port = port
+        self.baud = baud
+        self.rs485 = rs485
+        self.rx_buffer = rx_buffer
+        self.low_latency = low_latency
+        self.tuned = []
+        self.framer = LineFramer()
+        self.wave = None  # a rs485_wave.BurstReader while bursts are streamed or draining
+        self.on_line = on_line
+        self.on_sample = on_sample
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.ser = None
+        self.tx = None
+        self.running = False
+
+    @property
+    def stats(self):
+        return self.framer.stats
+
+    @property
+    def is_open(self):
+        return bool(self.ser and self.ser.is_open)
+
+    def open(self):
+        import serial
+        self.ser = serial.Serial(self.port, self.baud, timeout=0.2)
+        self.tuned = tune_port(self.ser, self.rx_buffer, self.low_latency)
+        try:
+            self.tx = TxQueue(
+                self.ser,
+                self.rs485,
+                on_sent=self.on_sent,
+                on_error=lambda e: self._error("send", e)
+            )
+        except Exception:
+            self.ser.close()
+            self.ser = None
+            raise
+        self.tx.start()
+        self.running = True
+        threading.Thread(target=self._reader, name=f"reader-{self.port}", daemon=True).start()
+
+    def close(self):
+        """Close the port once queued commands are written (bounded by
+        DRAIN_TIMEOUT); returns False if some were never sent."""
+        self.running = False
+        drained = self.tx.stop() if self.tx else True
+        if self.ser:
+            self.ser.close()
+        self.ser = None
+        return drained
+
+    def send(self, cmd):
+        """Queue cmd for transmit; False if it was already pending."""
+        return self.tx.put(cmd)
+
+    def flush(self, timeout=DRAIN_TIMEOUT):
+        """Wait until queued commands are on the wire; False if they aren't."""
+        return self.tx.flush(timeout)
+
+    def _error(self, where, e):
+        if self.running and self.on_error:
+            self.on_error(where, e)
+
+    def _reader(self):
+        while self.running:
+            try:
+                wave = self.wave
+                if wave and wave.drained():
+                    wave.handover(self.framer)
+                    self.wave = None
+                waiting = self.ser.in_waiting if self.ser else 0
+                if waiting:
+                    wave = self.wave
+                    if wave:
+                        st = self.framer.stats
+                        st.waiting_max = max(st.waiting_max, waiting)
+                        items = wave.pump(self.ser, waiting, self.framer)
+                    else:
+                        items = self.framer.feed(self.ser.read(waiting), waiting)
+                    for line, sample in items:
+                        if self.on_line:
+                            self.on_line(line)
+                        if sample and self.on_sample:
+                            self.on_sample(sample)
+                time.sleep(0.01)
+            except Exception as e:
+                self._error("read", e)
+                break
@@ -0,0 +1,229 @@
+import json, time, base64, hashlib, struct, select, threading
+from bisect import bisect_left, bisect_right
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8485)
+HISTORY = 100_000        # samples kept for /api/history
+BATCH_INTERVAL = 0.2     # seconds between WebSocket pushes
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+FIELDS = ["t", "v", "i", "p", "class"]
+
+
+def parse_address(text):
+    """"" -> default, "8080" -> localhost:8080, "0.0.0.0:8080" -> all
+    interfaces, "0.0.0.0" -> all interfaces on the default port.
+    Raises ValueError for a port that isn't a number in 1..65535."""
+    if not text:
+        return DEFAULT_ADDRESS
+    host, sep, port = text.rpartition(":")
+    if not sep and not port.isdigit():
+        host, port = port, ""  # host only
+    if not port:
+        return (host or DEFAULT_ADDRESS[0], DEFAULT_ADDRESS[1])
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"invalid port {port!r}")
+    return (host or DEFAULT_ADDRESS[0], int(port))
+
+
+# ================= API SERVER =================
+class HttpApi:
+    """REST + WebSocket view of the live stream.
+
+    publish() runs on the acquisition thread and only appends to a deque.
+    A batcher thread drains it every BATCH_INTERVAL, updates the latest
+    values and history, and encodes one WebSocket frame per batch that all
+    stream clients share; each client is served by its own handler thread,
+    so the number of clients never shows up on the acquisition path.
+
+        GET /api/latest                         latest V/I/P/class + connection
+        GET /api/history?since=T&until=T&limit=N samples by host time (epoch s)
+        WS  /api/stream                         {"fields": [...], "samples": [[...], ...]}
+    """
+
+    def __init__(self, address=None, history=HISTORY, interval=BATCH_INTERVAL):
+        self.address = address or DEFAULT_ADDRESS
+        self.interval = interval
+        self.latest = {"t": None, "v": None, "i": None, "p": None, "class": None}
+        self.state = {"connected": False, "port": None, "baud": None}
+        self._fresh = deque()
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._batch = threading.Condition()
+        self._seq = 0
+        self._frame = b""
+        self._running = False
+
+    def start(self):
+        handler = type("Handler", (_Handler,), {"api": self})
+        self._server = ThreadingHTTPServer(self.address, handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address[:2]
+        self._running = True
+        threading.Thread(target=self._server.serve_forever, name="http-api", daemon=True).start()
+        threading.Thread(target=self._batcher, name="http-batcher", daemon=True).start()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        with self._batch:
+            self._batch.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def publish(self, sample):
+        self._fresh.append(sample)
+
+    def set_state(self, connected, port=None, baud=None):
+        self.state = {"connected": connected, "port": port, "baud": baud}
+
+    # ---------- batching ----------
+    def _batcher(self):
+        while self._running:
+            time.sleep(self.interval)
+            rows = []
+            while self._fresh:
+                rows.append(self._fresh.popleft())
+            if not rows:
+                continue
+
+            latest = dict(self.latest)
+            for s in rows:
+                latest["t"] = s.t
+                for k, x in (("v", s.v), ("i", s.i), ("p", s.p), ("class", s.cls)):
+                    if x is not None:
+                        latest[k] = x
+            self.latest = latest
+            with self._lock:
+                self._history.extend(rows)
+
+            payload = json.dumps({"fields": FIELDS, "samples": [list(s) for s in rows]})
+            with self._batch:
+                self._frame = ws_frame(payload.encode())
+                self._seq += 1
+                self._batch.notify_all()
+
+    def next_frame(self, seq, timeout):
+        """Block until a batch newer than seq exists; returns (seq, frame).
+        A slow client simply skips to the newest batch."""
+        with self._batch:
+            self._batch.wait_for(lambda: self._seq != seq or not self._running, timeout)
+            return self._seq, self._frame
+
+    def history(self, since=None, until=None, limit=None):
+        with self._lock:
+            rows = list(self._history)
+        times = [s.t for s in rows]
+        lo = bisect_left(times, since) if since is not None else 0
+        hi = bisect_right(times, until) if until is not None else len(rows)
+        rows = rows[lo:hi]
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else []
+        return {"fields": FIELDS, "samples": [list(s) for s in rows]}
+
+
+# ================= WEBSOCKET =================
+def ws_frame(data, opcode=0x1):
+    n = len(data)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return head + data
+
+
+def _recv_exact(sock, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("closed")
+        buf += chunk
+    return buf
+
+
+def ws_read(sock):
+    """Read one client frame (clients always mask); returns (opcode, payload)."""
+    b0, b1 = _recv_exact(sock, 2)
+    n = b1 & 0x7F
+    if n == 126:
+        n, = struct.unpack("!H", _recv_exact(sock, 2))
+    elif n == 127:
+        n, = struct.unpack("!Q", _recv_exact(sock, 8))
+    mask = _recv_exact(sock, 4) if b1 & 0x80 else b"\0\0\0\0"
+    data = _recv_exact(sock, n)
+    return b0 & 0x0F, bytes(c ^ mask[k % 4] for k, c in enumerate(data))
+
+
+# ================= HANDLER =================
+class _Handler(BaseHTTPRequestHandler):
+    api = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet; the GUI log is the place for events
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/api/stream":
+            return self._stream()
+        if url.path == "/api/latest":
+            return self._json({**self.api.latest, "connection": self.api.state})
+        if url.path == "/api/history":
+            q = parse_qs(url.query)
+            try:
+                since = float(q["since"][0]) if "since" in q else None
+                until = float(q["until"][0]) if "until" in q else None
+                limit = int(q["limit"][0]) if "limit" in q else None
+            except ValueError:
+                return self._json({"error": "since/until/limit must be numbers"}, 400)
+            return self._json(self.api.history(since, until, limit))
+        if url.path == "/":
+            return self._json({"endpoints": ["/api/latest", "/api/history", "/api/stream"]})
+        self._json({"error": "not found"}, 404)
+
+    def _json(self, obj, code=200):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            return self._json({"error": "websocket upgrade required"}, 426)
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+
+        sock = self.connection
+        sock.settimeout(5)  # a stuck client only ever stalls this thread
+        seq = self.api._seq
+        try:
+            while self.api._running:
+                new, frame = self.api.next_frame(seq, 1.0)
+                if new != seq and frame:
+                    sock.sendall(frame)
+                    seq = new
+                # Service pings/close without a second thread per client
+                while select.select([sock], [], [], 0)[0]:
+                    op, data = ws_read(sock)
+                    if op == 0x8:
+                        sock.sendall(ws_frame(b"", 0x8))
+                        return
+                    if op == 0x9:
+                        sock.sendall(ws_frame(data, 0xA))
+        except (OSError, ConnectionError):
+            pass
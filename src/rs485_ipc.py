@@ -0,0 +1,322 @@
+import os, sys, math, socket, selectors, struct, tempfile, threading
+from collections import deque
+
+from rs485_core import Sample
+
+
+# ================= WIRE FORMAT =================
+# Every frame is a 3-byte header (type, payload length) followed by the
+# payload. Server -> client: SAMPLE. Client -> server: CMD.
+#   SAMPLE: <d t><d v><d i><d p> + utf-8 class (may be empty); NaN = missing
+#   CMD:    utf-8 command text, e.g. b"rs"
+HDR = struct.Struct("<BH")
+SAMPLE = struct.Struct("<dddd")
+T_SAMPLE = 1
+T_CMD = 2
+
+DEFAULT_TCP = ("127.0.0.1", 48500)
+MAX_BACKLOG = 256 * 1024  # bytes queued per subscriber before frames are dropped
+
+
+def default_address():
+    """Per-user UNIX socket: $XDG_RUNTIME_DIR if set, else a uid-suffixed
+    name in the temp dir. TCP on localhost where UNIX sockets are missing."""
+    if not hasattr(socket, "AF_UNIX"):
+        return DEFAULT_TCP
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "rs485-monitor.sock")
+    name = f"rs485-monitor-{os.getuid()}.sock" if hasattr(os, "getuid") else "rs485-monitor.sock"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def parse_address(text):
+    """"" -> platform default, "host:port" -> TCP, anything else -> socket path."""
+    if not text:
+        return default_address()
+    host, _, port = text.rpartition(":")
+    if host and port.isdigit():
+        return (host, int(port))
+    return text
+
+
+def _family(address):
+    return socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+
+
+def _nan(x):
+    return math.nan if x is None else x
+
+
+def _none(x):
+    return None if math.isnan(x) else x
+
+
+def encode_sample(s):
+    body = SAMPLE.pack(s.t, _nan(s.v), _nan(s.i), _nan(s.p)) + (s.cls or "").encode()
+    return HDR.pack(T_SAMPLE, len(body)) + body
+
+
+def decode_sample(body):
+    t, v, i, p = SAMPLE.unpack_from(body)
+    cls = body[SAMPLE.size:].decode(errors="replace") or None
+    return Sample(t, _none(v), _none(i), _none(p), cls)
+
+
+def encode_cmd(cmd):
+    body = cmd.encode()
+    return HDR.pack(T_CMD, len(body)) + body
+
+
+class Framer:
+    """Reassembles frames from a byte stream."""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def feed(self, data):
+        self.buf += data
+        frames = []
+        while len(self.buf) >= HDR.size:
+            kind, n = HDR.unpack_from(self.buf)
+            end = HDR.size + n
+            if len(self.buf) < end:
+                break
+            frames.append((kind, bytes(self.buf[HDR.size:end])))
+            del self.buf[:end]
+        return frames
+
+
+# ================= PUBLISHER =================
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.out = bytearray()
+        self.framer = Framer()
+        self.dropped = 0
+
+
+class Publisher:
+    """Fans parsed samples out to any number of local subscribers.
+
+    publish() is called from the acquisition thread and only encodes the
+    frame and appends it to a deque; all socket I/O happens on the
+    publisher's own thread. A subscriber that falls more than MAX_BACKLOG
+    bytes behind loses frames (counted in its `dropped`) instead of
+    stalling anyone else. Commands from subscribers are passed to
+    on_command if they are in `commands`.
+    """
+
+    def __init__(self, address=None, on_command=None, commands=("rs", "r")):
+        self.address = address or default_address()
+        self.on_command = on_command
+        self.commands = set(commands)
+        self.clients = []
+        self.published = 0
+        self._pending = deque()
+        self._woken = False
+        self._running = False
+
+    def start(self):
+        self._listen = self._bind()
+        self._listen.setblocking(False)
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._listen, selectors.EVENT_READ, "accept")
+        self._sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+        self._running = True
+        threading.Thread(target=self._loop, name="ipc-publisher", daemon=True).start()
+
+    def _bind(self):
+        fam = _family(self.address)
+        if fam == socket.AF_UNIX and os.path.exists(self.address):
+            # Refuse to steal the socket from a live instance, clear a stale one
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(self.address)
+            except OSError:
+                os.unlink(self.address)
+            else:
+                raise OSError(f"{self.address} is in use by another monitor")
+            finally:
+                probe.close()
+        s = socket.socket(fam, socket.SOCK_STREAM)
+        if fam == socket.AF_INET:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(self.address)
+        if fam == socket.AF_UNIX:
+            # Subscribers can send commands: owner only. Done before listen()
+            # so nobody can connect in between.
+            os.chmod(self.address, 0o600)
+        s.listen()
+        return s
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._wake()
+
+    def publish(self, sample):
+        self._pending.append(encode_sample(sample))
+        self.published += 1
+        if not self._woken:
+            self._woken = True
+            self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # a wakeup is already queued
+
+    # ---------- I/O thread ----------
+    def _loop(self):
+        while self._running:
+            for key, events in self._sel.select():
+                if key.data == "accept":
+                    self._accept()
+                elif key.data == "wake":
+                    self._drain_wake()
+                else:
+                    if events & selectors.EVENT_READ:
+                        self._read(key.data)
+                    if events & selectors.EVENT_WRITE:
+                        self._flush(key.data)
+        self._shutdown()
+
+    def _accept(self):
+        try:
+            sock, _ = self._listen.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        c = _Client(sock)
+        self.clients.append(c)
+        self._sel.register(sock, selectors.EVENT_READ, c)
+
+    def _drain_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        self._woken = False
+
+        frames = []
+        while self._pending:
+            frames.append(self._pending.popleft())
+        if not frames:
+            return
+        blob = b"".join(frames)
+        for c in list(self.clients):
+            if len(c.out) + len(blob) > MAX_BACKLOG:
+                c.dropped += len(frames)
+                continue
+            c.out += blob
+            self._flush(c)
+
+    def _flush(self, c):
+        try:
+            n = c.sock.send(c.out)
+            del c.out[:n]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(c)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if c.out else 0)
+        self._sel.modify(c.sock, events, c)
+
+    def _read(self, c):
+        try:
+            data = c.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(c)
+            return
+        for kind, body in c.framer.feed(data):
+            if kind != T_CMD:
+                continue
+            cmd = body.decode(errors="replace").strip()
+            if cmd in self.commands and self.on_command:
+                self.on_command(cmd)
+
+    def _drop(self, c):
+        if c in self.clients:
+            self.clients.remove(c)
+            self._sel.unregister(c.sock)
+            c.sock.close()
+
+    def _shutdown(self):
+        for c in list(self.clients):
+            self._drop(c)
+        self._sel.close()
+        self._listen.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        if _family(self.address) == socket.AF_UNIX:
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+
+# ================= SUBSCRIBER =================
+class Subscriber:
+    """Client side for automation scripts:
+
+        with Subscriber() as sub:
+            sub.send_cmd("rs")
+            for sample in sub:
+                print(sample.v, sample.i, sample.p)
+    """
+
+    def __init__(self, address=None, timeout=None):
+        self.address = address or default_address()
+        self.sock = socket.socket(_family(self.address), socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.address)
+        self.framer = Framer()
+
+    def send_cmd(self, cmd):
+        self.sock.sendall(encode_cmd(cmd))
+
+    def __iter__(self):
+        while True:
+            data = self.sock.recv(65536)
+            if not data:
+                return
+            for kind, body in self.framer.feed(data):
+                if kind == T_SAMPLE:
+                    yield decode_sample(body)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ================= CLI =================
+# python rs485_ipc.py [ADDRESS] [CMD...]  - print the live stream
+if __name__ == "__main__":
+    address = parse_address(sys.argv[1] if len(sys.argv) > 1 else "")
+    with Subscriber(address) as sub:
+        for cmd in sys.argv[2:]:
+            sub.send_cmd(cmd)
+        try:
+            for s in sub:
+                print(f"{s.t:.3f} V={s.v} I={s.i} P={s.p} class={s.cls}", flush=True)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,235 @@
+import sys, json, time, queue, argparse, threading
+from datetime import datetime
+
+from rs485_core import SerialLink
+
+
+# ================= PLAN =================
+# A plan is JSON:
+#
+#   {
+#     "name": "lamp-basic",
+#     "baud": 115200,
+#     "fixtures": [{"name": "bay1", "port": "/dev/ttyUSB0"},
+#                  {"name": "bay2", "port": "/dev/ttyUSB1"}],
+#     "steps": [
+#       {"send": "rs"},
+#       {"collect": 3, "timeout": 5},
+#       {"check": {"v": [220, 240], "i": [10, 15], "p": [2, 4], "class": ["A", "B"]}},
+#       {"sleep": 0.5},
+#       {"send": "r"}
+#     ]
+#   }
+#
+# send     clears the sample window and sends the command; fails if it
+#          isn't on the wire within `timeout` s (default 1)
+# collect  waits for N more parsed samples (fails after `timeout` s)
+# check    every value of each field in the window must be inside
+#          [min, max] (null = open end); class must match / be one of
+# sleep    waits, keeps collecting
+#
+# Optional plan keys: "stop_on_fail" (default true), "rs485":
+# [before_ms, after_ms] for direction control.
+
+FIELDS = {"v": "v", "i": "i", "p": "p", "class": "cls"}
+SEND_TIMEOUT = 1.0
+
+
+class PlanError(ValueError):
+    pass
+
+
+def load_plan(path):
+    with open(path) as f:
+        plan = json.load(f)
+    if not plan.get("fixtures"):
+        raise PlanError("plan has no fixtures")
+    for n, step in enumerate(plan.get("steps", [])):
+        kinds = {"send", "collect", "check", "sleep"} & set(step)
+        if len(kinds) != 1:
+            raise PlanError(f"step {n}: expected exactly one of send/collect/check/sleep")
+        for k in step.get("check", {}):
+            if k not in FIELDS:
+                raise PlanError(f"step {n}: unknown field {k!r}")
+    return plan
+
+
+# ================= FIXTURE WORKER =================
+class Fixture:
+    """Runs a plan's steps against one port on its own thread."""
+
+    def __init__(self, plan, spec):
+        self.plan = plan
+        self.name = spec.get("name", spec["port"])
+        self.port = spec["port"]
+        self.baud = int(spec.get("baud", plan.get("baud", 115200)))
+        rs485 = spec.get("rs485", plan.get("rs485"))
+        self.rs485 = tuple(ms / 1000 for ms in rs485) if rs485 else None
+        self.samples = queue.Queue()
+        self.window = []
+        self.errors = []
+        self.result = None
+
+    def run(self):
+        started = time.perf_counter()
+        steps = []
+        passed = True
+        error = None
+        link = SerialLink(
+            self.port, self.baud, self.rs485,
+            on_sample=self.samples.put,
+            on_error=lambda where, e: self.errors.append(f"{where}: {e}")
+        )
+        try:
+            link.open()
+            for n, step in enumerate(self.plan.get("steps", [])):
+                t0 = time.perf_counter()
+                rec = self._step(link, step)
+                rec.update(step=n, duration_s=round(time.perf_counter() - t0, 4))
+                if self.errors:
+                    rec.update(ok=False, error="; ".join(self.errors))
+                steps.append(rec)
+                if not rec["ok"]:
+                    passed = False
+                    if self.plan.get("stop_on_fail", True):
+                        break
+        except Exception as e:
+            passed = False
+            error = str(e)
+        finally:
+            link.close()
+
+        self.result = {
+            "name": self.name,
+            "port": self.port,
+            "passed": passed,
+            "error": error,
+            "duration_s": round(time.perf_counter() - started, 4),
+            "steps": steps,
+        }
+        return self.result
+
+    def _drain(self):
+        while True:
+            try:
+                self.window.append(self.samples.get_nowait())
+            except queue.Empty:
+                return
+
+    def _step(self, link, step):
+        if "send" in step:
+            self._drain()
+            self.window = []
+            link.send(step["send"])
+            if not link.flush(float(step.get("timeout", SEND_TIMEOUT))):
+                return {"type": "send", "ok": False, "cmd": step["send"], "error": "not transmitted"}
+            return {"type": "send", "ok": True, "cmd": step["send"]}
+
+        if "sleep" in step:
+            time.sleep(float(step["sleep"]))
+            self._drain()
+            return {"type": "sleep", "ok": True}
+
+        if "collect" in step:
+            want = len(self.window) + int(step["collect"])
+            deadline = time.monotonic() + float(step.get("timeout", 5))
+            while len(self.window) < want:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    self.window.append(self.samples.get(timeout=left))
+                except queue.Empty:
+                    break
+            ok = len(self.window) >= want
+            return {"type": "collect", "ok": ok, "samples": len(self.window)}
+
+        self._drain()
+        return self._check(step["check"])
+
+    def _check(self, limits):
+        ok = True
+        fields = {}
+        for key, limit in limits.items():
+            values = [getattr(s, FIELDS[key]) for s in self.window]
+            values = [x for x in values if x is not None]
+            if key == "class":
+                allowed = limit if isinstance(limit, list) else [limit]
+                good = bool(values) and all(x in allowed for x in values)
+                fields[key] = {"ok": good, "values": sorted(set(values)), "expect": allowed}
+            else:
+                lo, hi = limit
+                good = bool(values) and all(
+                    (lo is None or x >= lo) and (hi is None or x <= hi) for x in values
+                )
+                fields[key] = {
+                    "ok": good,
+                    "min": min(values) if values else None,
+                    "max": max(values) if values else None,
+                    "mean": sum(values) / len(values) if values else None,
+                    "limits": [lo, hi],
+                }
+            ok = ok and good
+        return {"type": "check", "ok": ok, "samples": len(self.window), "fields": fields}
+
+
+# ================= RUN =================
+def run_plan(plan):
+    """Run every fixture in parallel; the rack takes as long as its slowest unit."""
+    started = datetime.now().isoformat(timespec="seconds")
+    t0 = time.perf_counter()
+    fixtures = [Fixture(plan, spec) for spec in plan["fixtures"]]
+    threads = [
+        threading.Thread(target=f.run, name=f"fixture-{f.name}", daemon=True)
+        for f in fixtures
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results = [f.result for f in fixtures]
+    return {
+        "plan": plan.get("name"),
+        "started": started,
+        "duration_s": round(time.perf_counter() - t0, 4),
+        "passed": all(r["passed"] for r in results),
+        "fixtures": results,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run an RS485 lamp test plan headless")
+    ap.add_argument("plan", help="JSON test plan")
+    ap.add_argument("-o", "--output", help="write the JSON report here (default stdout)")
+    ap.add_argument("--port", action="append", default=[], metavar="FIXTURE=PORT",
+                    help="override a fixture's port (repeatable)")
+    args = ap.parse_args(argv)
+
+    try:
+        plan = load_plan(args.plan)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    for override in args.port:
+        name, _, port = override.partition("=")
+        for spec in plan["fixtures"]:
+            if spec.get("name", spec["port"]) == name:
+                spec["port"] = port
+
+    report = run_plan(plan)
+    for r in report["fixtures"]:
+        status = "PASS" if r["passed"] else "FAIL"
+        detail = f" ({r['error']})" if r["error"] else ""
+        print(f"{status} {r['name']} {r['port']} {r['duration_s']:.2f}s{detail}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import queue, struct, threading, time, zlib
+
+import numpy as np
+
+from rs485_core import LineFramer
+
+
+# ================= BURST FORMAT =================
+# After START_CMD the ESP32 sends binary bursts (text lines may still
+# appear between them) until STOP_CMD:
+#
+#   header   <2s H I f f H>  magic A5 5A, samples per channel n, sample
+#                            rate Hz, volts per count, mA per count, seq
+#   payload  n x (int16 v, int16 i), little endian, interleaved
+#   trailer  <I>             zlib.crc32 over header + payload
+START_CMD = "ws"
+STOP_CMD = "we"
+MAGIC = b"\xa5\x5a"
+HEADER = struct.Struct("<2sHIffH")
+TRAILER = struct.Struct("<I")
+MIN_SAMPLES = 16     # per channel; fewer can't be a real capture
+MAX_SAMPLES = 4096   # per channel
+POOL = 8             # preallocated burst buffers
+HARMONICS = 40       # highest harmonic included in THD
+DRAIN_QUIET = 0.2    # s without bytes (or before a text line counts) after STOP
+
+
+# ================= RECEIVE =================
+class BurstReader:
+    """Reads bursts straight into a pool of preallocated buffers.
+
+    pump() is called from the link's reader thread instead of the line
+    framer. Payload bytes go from the driver into a pooled buffer with
+    one readinto per read; no Python runs per sample. Filled buffers go
+    to on_burst(buf, header) and must come back through release(). When
+    the pool is exhausted (analysis behind) a burst is skipped, not queued.
+
+    After STOP_CMD call drain(): a burst already on the wire is still
+    parsed (and discarded) instead of reaching the line framer as binary
+    junk. Text seen meanwhile goes through a scratch framer, so the
+    session's integrity counters don't see the switch-over. The link
+    hands the port back to its framer once drained() is true.
+    """
+
+    def __init__(self, on_burst, max_samples=MAX_SAMPLES, pool=POOL):
+        self.on_burst = on_burst
+        self.max_samples = max_samples
+        self.free = queue.SimpleQueue()
+        for _ in range(pool):
+            self.free.put(np.empty(max_samples * 4 + TRAILER.size, dtype=np.uint8))
+        self.head = bytearray()  # bytes seen while looking for / parsing a header
+        self.buf = None          # buffer being filled
+        self.hdr = None
+        self.got = 0
+        self.need = 0
+        self.skip = 0
+        self.bursts = 0
+        self.bad = 0
+        self.dropped = 0
+        self.lines = None        # scratch LineFramer while draining
+        self.drain_at = None
+        self.last_rx = 0.0
+        self.resynced = False    # text line seen after the last burst while draining
+
+    def release(self, buf):
+        self.free.put(buf)
+
+    def drain(self):
+        self.lines = LineFramer()
+        self.drain_at = time.monotonic()
+        self.resynced = False
+
+    def drained(self):
+        """True once draining and the stream is back to text: no burst in
+        progress, and either DRAIN_QUIET without bytes or a text line."""
+        if self.drain_at is None or self.buf is not None or self.skip:
+            return False
+        now = time.monotonic()
+        if now - max(self.last_rx, self.drain_at) >= DRAIN_QUIET:
+            return True
+        return self.resynced and now - self.drain_at >= DRAIN_QUIET
+
+    def handover(self, framer):
+        """Pass text still buffered here on to the link's framer."""
+        framer.buf = (self.lines.buf if self.lines else b"") + bytes(self.head) + framer.buf
+        self.head = bytearray()
+
+    def pump(self, ser, waiting, framer):
+        """Consume `waiting` bytes; returns (line, sample) pairs for any text."""
+        if self.lines:
+            framer = self.lines
+        self.last_rx = time.monotonic()
+        items = []
+        while waiting > 0:
+            if self.skip:
+                n = len(ser.read(min(self.skip, waiting)))
+                self.skip -= n
+                waiting -= n
+                if not n:
+                    break
+            elif self.buf is not None:
+                want = min(self.need - self.got, waiting)
+                n = ser.readinto(memoryview(self.buf)[self.got:self.got + want])
+                self.got += n
+                waiting -= n
+                if self.got == self.need:
+                    self._finish()
+                elif n < want:
+                    break  # read timed out; pick up on the next call
+            else:
+                data = ser.read(waiting)
+                if not data:
+                    break
+                waiting -= len(data)
+                self.head += data
+                items += self._scan(framer)
+        return items
+
+    def _scan(self, framer):
+        items = []
+        while self.buf is None and not self.skip:
+            pos = self.head.find(MAGIC)
+            if pos < 0:
+                # Keep a trailing first magic byte, the rest is text
+                keep = 1 if self.head.endswith(MAGIC[:1]) else 0
+                text, self.head = self.head[:len(self.head) - keep], self.head[len(self.head) - keep:]
+                if text:
+                    lines = framer.feed(bytes(text))
+                    items += lines
+                    if self.lines and lines:
+                        self.resynced = True
+                return items
+            if pos:
+                items += framer.feed(bytes(self.head[:pos]))
+                del self.head[:pos]
+            self.resynced = False
+            if len(self.head) < HEADER.size:
+                return items
+
+            hdr = HEADER.unpack_from(self.head)
+            _, n, fs, _, _, _ = hdr
+            if not MIN_SAMPLES <= n <= self.max_samples or fs <= 0:
+                del self.head[:1]  # not a real header; resync on the next magic
+                self.bad += 1
+                continue
+
+            size = n * 4 + TRAILER.size
+            rest = self.head[HEADER.size:HEADER.size + size]
+            try:
+                buf = self.free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                self.skip = size - len(rest)
+                del self.head[:HEADER.size + len(rest)]
+                continue
+
+            self.buf, self.hdr = buf, (bytes(self.head[:HEADER.size]), hdr)
+            self.need = size
+            self.got = len(rest)
+            buf[:self.got] = np.frombuffer(rest, dtype=np.uint8)
+            del self.head[:HEADER.size + len(rest)]
+            if self.got == self.need:
+                self._finish()
+        return items
+
+    def _finish(self):
+        buf, (raw, hdr) = self.buf, self.hdr
+        self.buf = self.hdr = None
+        n = hdr[1]
+        crc = zlib.crc32(memoryview(buf)[:n * 4], zlib.crc32(raw))
+        (expect,) = TRAILER.unpack_from(buf, n * 4)
+        if crc != expect:
+            self.bad += 1
+            self.release(buf)
+            return
+        self.bursts += 1
+        if self.lines:
+            self.release(buf)  # stopping: nobody is analysing any more
+            return
+        self.on_burst(buf, hdr)
+
+
+# ================= ANALYSIS =================
+def _harmonics(x, fs, count=HARMONICS):
+    """(fundamental Hz, fundamental amplitude, THD) of one channel via FFT.
+    Hann window; each line's energy is summed over its main lobe (±1 bin)."""
+    n = len(x)
+    spec = np.abs(np.fft.rfft(x * np.hanning(n)))
+    k1 = int(np.argmax(spec[1:])) + 1
+    lobe = np.array([-1, 0, 1])
+    ks = np.rint(np.arange(1, count + 1) * k1).astype(int)
+    ks = ks[ks < len(spec)]  # never empty: k1 itself is a bin
+    mags = np.sqrt((spec[np.clip(ks[:, None] + lobe, 0, len(spec) - 1)] ** 2).sum(axis=1))
+    h1 = mags[0]
+    thd = np.sqrt((mags[1:] ** 2).sum()) / h1 if h1 else np.nan
+    return k1 * fs / n, h1, thd
+
+
+def analyze(buf, hdr):
+    """Vectorised power analysis of one burst.
+
+    Returns true RMS V/I, real/apparent power, power factor, THD of V and
+    I, and two short-term flicker proxies from half-cycle envelopes:
+    flicker_pct, the IEEE 1789 percent flicker of mean power (the lamp's
+    light output), and dv_pct, the relative fluctuation of the
+    half-cycle RMS voltage. Neither is an IEC 61000-4-15 Pst, which needs
+    minutes of data. ADC offsets are removed per burst.
+    """
+    _, n, fs, v_scale, i_scale, seq = hdr
+    x = np.frombuffer(buf, dtype="<i2", count=n * 2).reshape(n, 2).astype(np.float64)
+    x -= x.mean(axis=0)
+    v = x[:, 0] * v_scale
+    i = x[:, 1] * i_scale               # mA
+
+    vrms = np.sqrt(np.mean(v * v))
+    irms = np.sqrt(np.mean(i * i))
+    p = np.mean(v * i) / 1000           # W
+    s = vrms * irms / 1000              # VA
+    f0, _, thd_v = _harmonics(v, fs)
+    _, _, thd_i = _harmonics(i, fs)
+
+    half = max(int(round(fs / (2 * f0))), 1)
+    m = n // half
+    if m >= 2:
+        env_p = (v[:m * half] * i[:m * half]).reshape(m, half).mean(axis=1)
+        env_v = np.sqrt((v[:m * half] ** 2).reshape(m, half).mean(axis=1))
+        hi, lo = env_p.max(), env_p.min()
+        flicker = 100 * (hi - lo) / (hi + lo) if hi + lo else np.nan
+        dv = 100 * (env_v.max() - env_v.min()) / vrms if vrms else np.nan
+    else:
+        flicker = dv = np.nan
+
+    return {
+        "seq": seq,
+        "n": n,
+        "fs": fs,
+        "f0": f0,
+        "vrms": vrms,
+        "irms": irms,
+        "p": p,
+        "s": s,
+        "pf": p / s if s else np.nan,
+        "thd_v": thd_v,
+        "thd_i": thd_i,
+        "flicker_pct": flicker,
+        "dv_pct": dv,
+    }
+
+
+class Analyzer:
+    """Runs analyze() on its own thread; on_result(dict) is called there.
+    A burst that fails analysis (or whose on_result raises) is counted in
+    `errors` and skipped; the thread keeps going."""
+
+    def __init__(self, on_result, pool=POOL):
+        self.on_result = on_result
+        self.reader = BurstReader(self._queue, pool=pool)
+        self.jobs = queue.Queue()
+        self.running = False
+        self.last_ms = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, name="wave-analyzer", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.jobs.put(None)
+
+    def _queue(self, buf, hdr):
+        self.jobs.put((buf, hdr))
+
+    def _run(self):
+        while self.running:
+            job = self.jobs.get()
+            if job is None:
+                return
+            buf, hdr = job
+            t0 = time.perf_counter()
+            try:
+                result = analyze(buf, hdr)
+                self.last_ms = (time.perf_counter() - t0) * 1000
+                self.on_result(result)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            finally:
+                self.reader.release(buf)
+
+
+def encode_burst(v_counts, i_counts, fs, v_scale, i_scale, seq=0):
+    """Build one burst frame (for firmware reference and bench simulators)."""
+    payload = np.column_stack([v_counts, i_counts]).astype("<i2").tobytes()
+    head = HEADER.pack(MAGIC, len(v_counts), fs, v_scale, i_scale, seq & 0xFFFF)
+    return head + payload + TRAILER.pack(zlib.crc32(payload, zlib.crc32(head)))
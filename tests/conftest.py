@@ -0,0 +1,5 @@
+import os, sys
+
+# The helper modules sit beside the app script in src/ and import each
+# other by plain module name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("multiprocessing.shared_memory")
+
+from rs485_acq import SampleRing
+from rs485_core import Sample
+
+
+@pytest.fixture
+def ring():
+    r = SampleRing(slots=8)
+    yield r
+    r.close(unlink=True)
+
+
+def write(ring, seq, count):
+    for k in range(count):
+        seq = ring.write(seq, Sample(float(seq), 230.1, 12.5, None, "A"))
+    ring.commit(seq, seq)
+    return seq
+
+
+def test_ring_roundtrip(ring):
+    seq = write(ring, 0, 3)
+    out = ring.read_new()
+    assert [s.t for s in out] == [0.0, 1.0, 2.0]
+    assert out[0] == Sample(0.0, 230.1, 12.5, None, "A")
+    assert ring.read_new() == [] and seq == 3
+
+
+def test_reader_lapped_skips_ahead_and_counts(ring):
+    write(ring, 0, 20)
+    out = ring.read_new()
+    assert [s.t for s in out] == [float(k) for k in range(12, 20)]
+    assert ring.lost == 12
+
+
+def test_reader_attached_later_starts_at_the_writer(ring):
+    seq = write(ring, 0, 5)
+    other = SampleRing(ring.name, slots=8)
+    try:
+        write(ring, seq, 2)
+        assert [s.t for s in other.read_new()] == [5.0, 6.0]
+    finally:
+        other.close()
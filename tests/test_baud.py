@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+from rs485_baud import ACCEPT, CLEAR, detect_baud, detect_port_baud, score
+
+
+def test_one_csv_reading_is_clear():
+    s, good, csv = score(b"230.1,12.5,2.87,A\n")
+    assert (good, csv) == (1, 1) and s >= CLEAR
+
+
+def test_single_field_lines_are_not_csv():
+    s, good, csv = score(b"V=230.1\nI=12.5\n")
+    assert (good, csv) == (2, 0) and s >= CLEAR
+
+
+def test_garbage_scores_low():
+    s, good, csv = score(bytes(range(0x80, 0x100)) + b"\n\xff\xfe\n")
+    assert good == 0 and s < ACCEPT
+
+
+def test_text_without_measurements_is_not_accepted():
+    s, good, _ = score(b"ready\nOK\n")
+    assert good == 0 and s < CLEAR
+
+
+def test_empty():
+    assert score(b"") == (0.0, 0, 0)
+
+
+class FakeSerial:
+    """Answers the probe at one baud rate; records RTS around each write.
+    No kernel RS485 support, so direction control falls back to software RTS."""
+
+    answer_at = 38400
+
+    def __init__(self, port, baudrate, timeout=None):
+        self.baudrate = baudrate
+        self.rx = b""
+        self.log = []
+        FakeSerial.last = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def rs485_mode(self):
+        return None
+
+    @rs485_mode.setter
+    def rs485_mode(self, value):
+        if value is not None:
+            raise ValueError("not supported")
+
+    @property
+    def rts(self):
+        return self.log[-1] == "rts" if self.log else False
+
+    @rts.setter
+    def rts(self, level):
+        self.log.append("rts" if level else "rx")
+
+    def reset_input_buffer(self):
+        self.rx = b""
+
+    def write(self, data):
+        self.log.append(("tx", data, self.rts))
+        if self.baudrate == self.answer_at:
+            self.rx += b"230.1,12.5,2.87,A\n"
+
+    def flush(self):
+        pass
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, n):
+        data, self.rx = self.rx[:n], self.rx[n:]
+        return data
+
+
+@pytest.fixture
+def fake_serial(monkeypatch):
+    serial = pytest.importorskip("serial")
+    pytest.importorskip("serial.rs485")
+    monkeypatch.setattr(serial, "Serial", FakeSerial)
+    return FakeSerial
+
+
+def test_probe_drives_rts_with_rs485(fake_serial):
+    r = detect_baud("fake", window=0.05, rs485=(0, 0))
+    assert r.baud == 38400
+    writes = [e for e in fake_serial.last.log if isinstance(e, tuple)]
+    assert len(writes) == 3 and all(raised for _, _, raised in writes)
+    assert fake_serial.last.log[-1] == "rx"  # back to receive after the probe
+
+
+def test_probe_without_rs485_leaves_rts_alone(fake_serial):
+    r = detect_baud("fake", window=0.05)
+    assert r.baud == 38400
+    assert all(isinstance(e, tuple) and not e[2] for e in fake_serial.last.log)
+
+
+def test_cancel_stops_detection(fake_serial):
+    cancel = threading.Event()
+    cancel.set()
+    assert detect_baud("fake", cancel=cancel).scores == {}
+    seen = []
+    assert detect_port_baud(["a", "b"], on_result=seen.append, cancel=cancel) is None
+    assert seen == []
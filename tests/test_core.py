@@ -0,0 +1,160 @@
+import threading, time
+
+import pytest
+
+from rs485_core import LineFramer, Sample, TxQueue, merge, parse_line
+
+
+class FakePort:
+    """Stands in for serial.Serial on the transmit side."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.written = b""
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        if self.fail:
+            raise OSError("port gone")
+        time.sleep(self.delay)
+        with self.lock:
+            self.written += data
+
+    def flush(self):
+        pass
+
+
+# ================= PARSER =================
+@pytest.mark.parametrize("line, expect", [
+    ("230.1,12.5,2.87", (230.1, 12.5, 2.87, None)),
+    ("230.1,12.5,2.87,A", (230.1, 12.5, 2.87, "A")),
+    ("230.1,12.5,2.87, ", (230.1, 12.5, 2.87, None)),
+    ("#1042 230.1,12.5,2.87,B", (230.1, 12.5, 2.87, "B")),
+    ("V=229.9", (229.9, None, None, None)),
+    ("I = 12.5", (None, 12.5, None, None)),
+    ("A=0.5", (None, 0.5, None, None)),
+    ("P=-1.25", (None, None, -1.25, None)),
+])
+def test_parse_line(line, expect):
+    s = parse_line(line, t=1.0)
+    assert s == Sample(1.0, *expect)
+
+
+@pytest.mark.parametrize("line", ["", "OK", "230.1,12.5", "230.1,x,2.87", "hello, world, !"])
+def test_parse_line_rejects(line):
+    assert parse_line(line) is None
+
+
+def test_merge_keeps_newest_value_of_each_field():
+    s = merge([
+        Sample(1, 230.0, 12.0, 2.0, "A"),
+        Sample(2, 231.0, None, None, None),
+        Sample(3, None, 13.0, None, None),
+    ])
+    assert s == Sample(3, 231.0, 13.0, 2.0, "A")
+
+
+# ================= FRAMER =================
+def test_framer_reassembles_lines_split_across_reads():
+    f = LineFramer()
+    assert f.feed(b"230.1,12") == []
+    out = f.feed(b".5,2.87,A\nV=22", waiting=40)
+    assert [line for line, _ in out] == ["230.1,12.5,2.87,A"]
+    assert out[0][1].v == 230.1
+    out = f.feed(b"9.9\r\n")
+    assert out[0][1].v == 229.9
+    st = f.stats
+    assert (st.lines, st.samples, st.bad, st.waiting_max) == (2, 2, 0, 40)
+
+
+def test_framer_counts_damaged_lines():
+    f = LineFramer()
+    out = f.feed(
+        b"230.1,12.5,2.87\n"
+        b"23\xff.1,12.5,2.87\n"           # corrupt
+        b"230.1,12.5\n"                   # truncated
+        b"230.1,x,2.87\n"                 # malformed
+        + b"1" * 200 + b"\n"              # oversize
+        b"\n"                             # blank: ignored
+    )
+    assert [s is not None for _, s in out] == [True, False, False, False, False, False]
+    st = f.stats
+    assert (st.lines, st.samples) == (5, 1)
+    assert (st.corrupt, st.truncated, st.malformed, st.oversize) == (1, 1, 1, 1)
+    assert st.bad == 4
+    assert st.loss_rate == pytest.approx(4 / 5)
+
+
+def test_framer_accepts_extra_trailing_fields_like_parse_line():
+    f = LineFramer()
+    line = "230.1,12.5,2.87,A,fw1.2,ok"
+    (got, sample), = f.feed(line.encode() + b"\n")
+    assert sample == parse_line(line, t=sample.t)
+    assert (sample.v, sample.cls) == (230.1, "A")
+    assert f.stats.bad == 0
+
+
+def test_framer_resyncs_when_newline_never_comes():
+    f = LineFramer()
+    f.feed(b"x" * 600)
+    assert f.stats.oversize == 1
+    out = f.feed(b"230.1,12.5,2.87\n")
+    assert out[0][1] is not None
+
+
+def test_framer_tracks_sequence_gaps():
+    f = LineFramer()
+    f.feed(b"".join(b"#%d 230.1,12.5,2.87\n" % n for n in (1, 2, 5, 6, 10)))
+    st = f.stats
+    assert (st.seq_gaps, st.seq_lost) == (2, 5)
+    assert st.loss_rate == pytest.approx(5 / 10)
+    f.feed(b"#1 230.1,12.5,2.87\n#2 230.1,12.5,2.87\n")  # device reset
+    assert (st.seq_gaps, st.seq_lost) == (2, 5)
+
+
+# ================= TX QUEUE =================
+def test_txqueue_stop_drains_pending_commands():
+    port = FakePort(delay=0.02)
+    tx = TxQueue(port)
+    tx.start()
+    for cmd in ("ws", "rs", "we"):
+        tx.put(cmd)
+    assert tx.stop() is True
+    assert port.written == b"ws\nrs\nwe\n"
+
+
+def test_txqueue_stop_is_bounded():
+    port = FakePort(delay=0.2)
+    tx = TxQueue(port)
+    tx.start()
+    for cmd in ("a", "b", "c", "d"):
+        tx.put(cmd)
+    t0 = time.monotonic()
+    assert tx.stop(timeout=0.1) is False
+    assert time.monotonic() - t0 < 0.2
+
+
+def test_txqueue_coalesces_pending_duplicates():
+    port = FakePort(delay=0.05)
+    tx = TxQueue(port)
+    tx.start()
+    assert tx.put("a")
+    assert tx.put("b")
+    assert not tx.put("b")
+    assert tx.flush()
+    assert port.written == b"a\nb\n"
+    assert (tx.sent, tx.coalesced) == (2, 1)
+    assert tx.put("b")  # no longer pending
+    tx.stop()
+
+
+def test_txqueue_write_error_stops_writer_and_fails_flush():
+    errors = []
+    tx = TxQueue(FakePort(fail=True), on_error=errors.append)
+    tx.start()
+    tx.put("rs")
+    assert tx.flush(timeout=1.0) is False
+    assert isinstance(tx.error, OSError)
+    assert len(errors) == 1
+    assert tx.stop() is False
@@ -0,0 +1,20 @@
+import pytest
+
+from rs485_http import DEFAULT_ADDRESS, parse_address
+
+
+@pytest.mark.parametrize("text, expect", [
+    ("", DEFAULT_ADDRESS),
+    ("8080", (DEFAULT_ADDRESS[0], 8080)),
+    (":8080", (DEFAULT_ADDRESS[0], 8080)),
+    ("0.0.0.0:8080", ("0.0.0.0", 8080)),
+    ("localhost", ("localhost", DEFAULT_ADDRESS[1])),
+])
+def test_parse_address(text, expect):
+    assert parse_address(text) == expect
+
+
+@pytest.mark.parametrize("text", ["localhost:http", "0.0.0.0:0", "host:70000"])
+def test_parse_address_rejects_bad_port(text):
+    with pytest.raises(ValueError):
+        parse_address(text)
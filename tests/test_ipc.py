@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import rs485_ipc as I
+from rs485_core import Sample
+
+
+def test_sample_roundtrip_keeps_full_precision():
+    s = Sample(1792374870.8667064, 230.1, 12.5, None, "A")
+    frames = I.Framer().feed(I.encode_sample(s))
+    assert frames[0][0] == I.T_SAMPLE
+    assert I.decode_sample(frames[0][1]) == s
+
+
+def test_framer_reassembles_partial_frames():
+    data = I.encode_sample(Sample(1.0, 230.1, 1.0, 2.0, None)) + I.encode_cmd("rs")
+    f = I.Framer()
+    frames = []
+    for k in range(len(data)):
+        frames += f.feed(data[k:k + 1])
+    assert [kind for kind, _ in frames] == [I.T_SAMPLE, I.T_CMD]
+    assert frames[1][1] == b"rs"
+
+
+@pytest.mark.parametrize("text, expect", [
+    ("127.0.0.1:9000", ("127.0.0.1", 9000)),
+    ("/tmp/rs485.sock", "/tmp/rs485.sock"),
+])
+def test_parse_address(text, expect):
+    assert I.parse_address(text) == expect
+
+
+def test_unix_socket_is_owner_only(tmp_path):
+    if not hasattr(I.socket, "AF_UNIX"):
+        pytest.skip("no UNIX sockets")
+    pub = I.Publisher(str(tmp_path / "rs485.sock"))
+    pub.start()
+    try:
+        assert os.stat(pub.address).st_mode & 0o777 == 0o600
+    finally:
+        pub.stop()
+
+
+def test_default_address_is_per_user(monkeypatch, tmp_path):
+    if not hasattr(I.socket, "AF_UNIX"):
+        pytest.skip("no UNIX sockets")
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert I.default_address() == str(tmp_path / "rs485-monitor.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert str(os.getuid()) in os.path.basename(I.default_address())
@@ -0,0 +1,147 @@
+import json, os, threading, time
+
+import pytest
+
+import rs485_runner as R
+from rs485_core import Sample
+
+
+def plan(steps, **kw):
+    return dict({"fixtures": [{"name": "bay1", "port": "/dev/null"}], "steps": steps}, **kw)
+
+
+def fixture(samples=(), **kw):
+    f = R.Fixture(plan([], **kw), {"name": "bay1", "port": "/dev/null"})
+    f.window = list(samples)
+    return f
+
+
+class FakeLink:
+    def __init__(self, sends=True):
+        self.sends = sends
+        self.sent = []
+
+    def send(self, cmd):
+        self.sent.append(cmd)
+        return True
+
+    def flush(self, timeout):
+        return self.sends
+
+
+# ================= PLAN =================
+def test_load_plan_validates(tmp_path):
+    path = tmp_path / "plan.json"
+    cases = [
+        ({"steps": []}, "no fixtures"),
+        (plan([{"send": "rs", "sleep": 1}]), "exactly one"),
+        (plan([{"wait": 1}]), "exactly one"),
+        (plan([{"check": {"q": [0, 1]}}]), "unknown field"),
+    ]
+    for bad, msg in cases:
+        path.write_text(json.dumps(bad))
+        with pytest.raises(R.PlanError, match=msg):
+            R.load_plan(path)
+    path.write_text(json.dumps(plan([{"send": "rs"}, {"collect": 1}])))
+    assert R.load_plan(path)["steps"][0] == {"send": "rs"}
+
+
+def test_fixture_settings_inherit_from_plan():
+    f = R.Fixture(plan([], baud=9600, rs485=[1, 2]), {"port": "/dev/ttyUSB0"})
+    assert (f.name, f.baud, f.rs485) == ("/dev/ttyUSB0", 9600, (0.001, 0.002))
+
+
+# ================= CHECK =================
+def test_check_ranges_and_class():
+    f = fixture([Sample(0, 230.0, 12.0, 2.8, "A"), Sample(1, 232.0, 12.5, None, "B")])
+    rec = f._check({"v": [220, 240], "i": [None, 13], "p": [2, 4], "class": ["A", "B"]})
+    assert rec["ok"] and rec["samples"] == 2
+    v = rec["fields"]["v"]
+    assert (v["min"], v["max"], v["mean"]) == (230.0, 232.0, 231.0)
+    assert rec["fields"]["class"]["values"] == ["A", "B"]
+
+
+@pytest.mark.parametrize("limits", [
+    {"v": [231, None]},
+    {"i": [None, 12.2]},
+    {"class": "A"},
+])
+def test_check_fails_when_any_value_is_outside(limits):
+    f = fixture([Sample(0, 230.0, 12.0, 2.8, "A"), Sample(1, 232.0, 12.5, 2.9, "B")])
+    assert not f._check(limits)["ok"]
+
+
+def test_check_fails_without_values():
+    f = fixture([Sample(0, 230.0, None, None, None)])
+    rec = f._check({"i": [0, 20]})
+    assert not rec["ok"] and rec["fields"]["i"]["mean"] is None
+
+
+# ================= STEPS =================
+def test_send_step_clears_window_and_waits_for_write():
+    f = fixture([Sample(0, 230.0, 1, 1, None)])
+    link = FakeLink()
+    rec = f._step(link, {"send": "rs"})
+    assert rec == {"type": "send", "ok": True, "cmd": "rs"}
+    assert link.sent == ["rs"] and f.window == []
+
+
+def test_send_step_fails_when_not_transmitted():
+    rec = fixture()._step(FakeLink(sends=False), {"send": "r", "timeout": 0.1})
+    assert not rec["ok"] and rec["error"] == "not transmitted"
+
+
+def test_collect_step_times_out():
+    f = fixture()
+    f.samples.put(Sample(0, 230.0, 1, 1, None))
+    rec = f._step(FakeLink(), {"collect": 2, "timeout": 0.05})
+    assert rec == {"type": "collect", "ok": False, "samples": 1}
+
+
+# ================= END TO END =================
+def pty_device(answer):
+    """A pty that answers "rs" with `answer` lines; returns (port, received)."""
+    pty = pytest.importorskip("pty")
+    tty = pytest.importorskip("tty")
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    received = []
+
+    def run():
+        buf = b""
+        while True:
+            try:
+                buf += os.read(master, 100)
+            except OSError:
+                return
+            while b"\n" in buf:
+                cmd, buf = buf.split(b"\n", 1)
+                received.append(cmd.decode())
+                if cmd == b"rs":
+                    os.write(master, answer)
+
+    threading.Thread(target=run, daemon=True).start()
+    return os.ttyname(slave), received
+
+
+def test_run_plan_sends_final_command():
+    pytest.importorskip("serial")
+    port, received = pty_device(b"230.1,12.5,2.87,A\n" * 3)
+    report = R.run_plan({
+        "name": "lamp-basic",
+        "fixtures": [{"name": "bay1", "port": port}],
+        "steps": [
+            {"send": "rs"},
+            {"collect": 3, "timeout": 2},
+            {"check": {"v": [220, 240], "class": ["A", "B"]}},
+            {"send": "r"},
+        ],
+    })
+    fx = report["fixtures"][0]
+    assert report["passed"], fx
+    assert [s["type"] for s in fx["steps"]] == ["send", "collect", "check", "send"]
+    deadline = time.monotonic() + 1
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert received == ["rs", "r"]
@@ -0,0 +1,21 @@
+import os, re, subprocess, sys
+
+import pytest
+
+pytest.importorskip("PySide6.QtWidgets")
+pytest.importorskip("serial")
+
+APP = os.path.join(os.path.dirname(__file__), "..", "src", "RS485-PythonApp.py")
+# Same default as --bench-startup; slow CI machines can raise it
+BUDGET_MS = float(os.environ.get("RS485_STARTUP_BUDGET_MS", 1000))
+
+
+def test_startup_within_budget():
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    proc = subprocess.run(
+        [sys.executable, APP, "--bench-startup", str(BUDGET_MS)],
+        env=env, capture_output=True, text=True, timeout=60
+    )
+    m = re.search(r"startup: ([\d.]+) ms", proc.stdout)
+    assert m, proc.stdout + proc.stderr
+    assert proc.returncode == 0, f"startup took {m.group(1)} ms, budget {BUDGET_MS:.0f} ms"
@@ -0,0 +1,269 @@
+import io, os, threading, time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import rs485_wave as W
+from rs485_core import LineFramer
+
+FS = 10000
+V_SCALE, I_SCALE = 0.02, 0.01
+
+
+class FakePort:
+    """Byte source with the read/readinto subset BurstReader uses."""
+
+    def __init__(self, data):
+        self.buf = io.BytesIO(data)
+
+    def read(self, n):
+        return self.buf.read(n)
+
+    def readinto(self, b):
+        return self.buf.readinto(b)
+
+
+def wave(n, fs=FS, f0=50.0, v_rms=230.0, i_rms=0.1, phase=0.0, h3=0.0):
+    """Counts for a sine voltage and a current lagging by `phase` rad with
+    an optional 3rd harmonic (relative amplitude h3)."""
+    t = np.arange(n) / fs
+    v = v_rms * np.sqrt(2) * np.sin(2 * np.pi * f0 * t)
+    i = i_rms * 1000 * np.sqrt(2) * (
+        np.sin(2 * np.pi * f0 * t - phase) + h3 * np.sin(3 * 2 * np.pi * f0 * t)
+    )
+    return np.round(v / V_SCALE), np.round(i / I_SCALE)
+
+
+def burst(n, seq=0, **kw):
+    return W.encode_burst(*wave(n, **kw), FS, V_SCALE, I_SCALE, seq)
+
+
+def pump(reader, data, chunk=None):
+    framer = LineFramer()
+    items = []
+    chunk = chunk or len(data)
+    for k in range(0, len(data), chunk):
+        part = data[k:k + chunk]
+        items += reader.pump(FakePort(part), len(part), framer)
+    return items
+
+
+class Collect:
+    def __init__(self):
+        self.bursts = []
+
+    def __call__(self, buf, hdr):
+        self.bursts.append((buf.copy(), hdr))
+
+
+# ================= RECEIVE =================
+def test_burst_roundtrip_with_text_around_it():
+    got = Collect()
+    reader = W.BurstReader(got)
+    items = pump(reader, b"OK\n" + burst(1000, seq=7) + b"230.1,12.5,2.87,A\n")
+    assert [line for line, _ in items] == ["OK", "230.1,12.5,2.87,A"]
+    assert reader.bursts == 1 and reader.bad == 0
+    buf, hdr = got.bursts[0]
+    assert hdr[1] == 1000 and hdr[5] == 7
+    v, i = wave(1000)
+    x = np.frombuffer(buf, dtype="<i2", count=2000).reshape(1000, 2)
+    assert (x[:, 0] == v).all() and (x[:, 1] == i).all()
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1000])
+def test_burst_split_across_reads(chunk):
+    got = Collect()
+    reader = W.BurstReader(got)
+    pump(reader, burst(500, seq=1) + burst(500, seq=2), chunk)
+    assert [h[5] for _, h in got.bursts] == [1, 2]
+
+
+def test_corrupt_burst_is_counted_and_buffer_returned():
+    got = Collect()
+    reader = W.BurstReader(got, pool=1)
+    bad = bytearray(burst(256, seq=1))
+    bad[W.HEADER.size + 10] ^= 0xFF
+    pump(reader, bytes(bad) + burst(256, seq=2))
+    assert reader.bad == 1
+    assert [h[5] for _, h in got.bursts] == [2]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, W.MIN_SAMPLES - 1, W.MAX_SAMPLES + 1])
+def test_out_of_range_header_resyncs(n):
+    got = Collect()
+    reader = W.BurstReader(got)
+    head = W.HEADER.pack(W.MAGIC, n, FS, V_SCALE, I_SCALE, 1)
+    pump(reader, head + b"\n" + burst(400, seq=2))
+    assert reader.bad >= 1
+    assert [h[5] for _, h in got.bursts] == [2]
+
+
+def test_pool_exhaustion_skips_bursts():
+    got = []
+    reader = W.BurstReader(lambda buf, hdr: got.append(hdr[5]), pool=2)
+    items = pump(reader, b"".join(burst(300, seq=k) for k in range(4)) + b"V=230\n")
+    assert got == [0, 1]
+    assert reader.dropped == 2
+    assert items[-1][1].v == 230  # stream still in sync after the skipped bursts
+
+
+# ================= ANALYSIS =================
+def analyze(n, **kw):
+    frame = burst(n, **kw)
+    hdr = W.HEADER.unpack_from(frame)
+    return W.analyze(np.frombuffer(frame[W.HEADER.size:], dtype=np.uint8), hdr)
+
+
+def test_analyze_known_signal():
+    res = analyze(2000, phase=np.arccos(0.8), h3=0.1)
+    assert res["f0"] == pytest.approx(50, abs=0.1)
+    assert res["vrms"] == pytest.approx(230, rel=1e-3)
+    assert res["irms"] == pytest.approx(100 * np.sqrt(1.01), rel=1e-3)
+    assert res["pf"] == pytest.approx(0.8 / np.sqrt(1.01), abs=2e-3)
+    assert res["thd_v"] < 0.005
+    assert res["thd_i"] == pytest.approx(0.1, abs=0.005)
+    assert res["flicker_pct"] < 1
+
+
+@pytest.mark.parametrize("n", [W.MIN_SAMPLES, W.MIN_SAMPLES + 1, 31, 64, W.MAX_SAMPLES])
+def test_analyze_edge_sizes(n):
+    res = analyze(n)
+    assert res["n"] == n
+    assert np.isfinite(res["vrms"]) and np.isfinite(res["f0"])
+
+
+def test_analyze_fundamental_in_last_bin():
+    # f0 at Nyquist leaves no room above the fundamental for harmonics
+    res = analyze(W.MIN_SAMPLES, f0=FS / 2 - 1)
+    assert np.isfinite(res["vrms"])
+
+
+def test_analyze_silence():
+    frame = W.encode_burst(np.zeros(64), np.zeros(64), FS, V_SCALE, I_SCALE)
+    hdr = W.HEADER.unpack_from(frame)
+    res = W.analyze(np.frombuffer(frame[W.HEADER.size:], dtype=np.uint8), hdr)
+    assert res["vrms"] == 0 and np.isnan(res["pf"])
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_analyzer_end_to_end():
+    results = []
+    a = W.Analyzer(results.append)
+    a.start()
+    try:
+        pump(a.reader, burst(2, seq=1) + burst(2000, seq=2) + burst(W.MIN_SAMPLES, seq=3))
+        assert wait_for(lambda: len(results) == 2)
+        assert [r["seq"] for r in results] == [2, 3]
+        assert a.errors == 0
+    finally:
+        a.stop()
+
+
+def test_analyzer_survives_failing_consumer():
+    calls = []
+
+    def on_result(res):
+        calls.append(res["seq"])
+        raise RuntimeError("sink failed")
+
+    a = W.Analyzer(on_result, pool=2)
+    a.start()
+    try:
+        pump(a.reader, b"".join(burst(500, seq=k) for k in range(2)))
+        assert wait_for(lambda: a.errors == 2)
+        pump(a.reader, burst(500, seq=9))  # buffers came back to the pool
+        assert wait_for(lambda: calls == [0, 1, 9])
+        assert a.reader.dropped == 0
+    finally:
+        a.stop()
+
+
+def test_drain_finishes_burst_in_flight_without_integrity_loss():
+    framer = LineFramer()
+    reader = W.BurstReader(Collect(), pool=2)
+    frame = burst(4096, seq=1)
+    half = len(frame) // 2
+    reader.pump(FakePort(frame[:half]), half, framer)
+    reader.drain()
+    assert not reader.drained()  # mid-burst
+    tail = frame[half:] + b"OK\n230.1,12.5,2.87,A\n"
+    items = reader.pump(FakePort(tail), len(tail), framer)
+    assert [line for line, _ in items] == ["OK", "230.1,12.5,2.87,A"]
+    assert items[1][1].v == 230.1
+    assert reader.bursts == 1 and reader.bad == 0
+    assert reader.free.qsize() == 2  # the burst's buffer went back to the pool
+    assert framer.stats.bad == 0 and framer.stats.lines == 0
+    assert wait_for(reader.drained)
+
+
+def test_drain_hands_partial_text_to_the_framer():
+    framer = LineFramer()
+    reader = W.BurstReader(Collect())
+    reader.drain()
+    reader.pump(FakePort(b"230.1,12"), 8, framer)
+    assert wait_for(reader.drained)
+    reader.handover(framer)
+    (line, sample), = framer.feed(b".5,2.87\n")
+    assert sample.v == 230.1 and framer.stats.bad == 0
+
+
+def test_link_stops_waveform_mid_burst():
+    pty = pytest.importorskip("pty")
+    tty = pytest.importorskip("tty")
+    pytest.importorskip("serial")
+    from rs485_core import SerialLink
+
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    frame = burst(4096)
+    state = {"streaming": False}
+
+    def device():
+        # Roughly 115200 baud: a 4096-sample burst takes over a second
+        buf = b""
+        while True:
+            try:
+                buf += os.read(master, 100)
+            except OSError:
+                return
+            if b"ws\n" in buf:
+                state["streaming"] = True
+                threading.Thread(target=stream, daemon=True).start()
+            if b"we\n" in buf:
+                state["streaming"] = False
+            buf = buf[-2:]
+
+    def stream():
+        while state["streaming"]:
+            for k in range(0, len(frame), 512):
+                os.write(master, frame[k:k + 512])
+                time.sleep(0.04)
+        for _ in range(3):
+            os.write(master, b"230.1,12.5,2.87,A\n")
+
+    threading.Thread(target=device, daemon=True).start()
+    lines = []
+    link = SerialLink(os.ttyname(slave), 115200, on_line=lines.append)
+    reader = W.BurstReader(Collect())
+    link.wave = reader
+    link.open()
+    try:
+        link.send(W.START_CMD)
+        time.sleep(0.6)          # part-way into the first burst
+        link.send(W.STOP_CMD)
+        reader.drain()
+        assert wait_for(lambda: link.wave is None, timeout=5)
+        assert wait_for(lambda: len(lines) == 3)
+    finally:
+        link.close()
+    assert reader.bursts == 1
+    assert lines == ["230.1,12.5,2.87,A"] * 3
+    assert link.stats.bad == 0